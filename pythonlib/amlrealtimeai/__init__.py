@@ -1 +1,32 @@
-from .client import PredictionClient
\ No newline at end of file
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+# The clients are imported on first access so that importing the package, or
+# one client, does not pay for the others (e.g. grpc.aio or multiprocessing).
+import importlib
+
+_EXPORTS = {
+    'PredictionClient': '.client',
+    'AsyncPredictionClient': '.aio_client',
+    'BatchingPredictionClient': '.batching',
+    'PooledPredictionClient': '.pool',
+    'PipelinedPredictionClient': '.pipelined',
+    'ClientMetrics': '.metrics',
+    'ResultCache': '.cache',
+    'RetryPolicy': '.retry',
+    'RetryBudget': '.retry',
+    'ImagePreprocessor': '.preprocessing',
+    'ModelSignature': '.signature',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
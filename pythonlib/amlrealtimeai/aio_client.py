@@ -0,0 +1,136 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+import asyncio
+import grpc
+import grpc.aio
+
+from .client import PredictionClient
+from .retry import RetryBudget, RetryPolicy
+from .tensor_codec import fill_tensor_proto, make_ndarray, writable
+
+from . import protos
+from .protos import predict_pb2, types_pb2
+
+class AsyncPredictionClient:
+    """asyncio counterpart of PredictionClient built on grpc.aio.
+
+    Calls never block the event loop, so a single task can keep many requests
+    in flight. At most max_concurrency requests are sent at the same time,
+    the rest wait for a free slot. Requests waiting out a retry backoff do not
+    hold a slot.
+    """
+
+    def __init__(self, address: str, port: int, use_ssl:bool = False, access_token:str = "", max_concurrency:int = 100,
+                 retry_policy:RetryPolicy = None):
+        if(address is None):
+            raise ValueError("address")
+
+        if(port is None):
+            raise ValueError("port")
+
+        if(max_concurrency is None or max_concurrency < 1):
+            raise ValueError("max_concurrency")
+
+        host = "{0}:{1}".format(address, port)
+
+        if use_ssl:
+            self._channel_func = lambda: grpc.aio.secure_channel(host, grpc.ssl_channel_credentials())
+        else:
+            self._channel_func = lambda: grpc.aio.insecure_channel(host)
+
+        self.__max_concurrency = max_concurrency
+        self._retry_policy = retry_policy if retry_policy is not None else RetryPolicy(budget=RetryBudget())
+        # asyncio primitives and aio channels are bound to the running loop,
+        # so they are created on first use rather than here
+        self.__semaphore = None
+        self.__channel = None
+        self.__stub = None
+        # channels being closed in the background, the event loop only keeps weak references to tasks
+        self.__closing = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        self.__stub = None
+        if self.__channel is not None:
+            channel = self.__channel
+            self.__channel = None
+            await channel.close()
+        if self.__closing:
+            await asyncio.gather(*self.__closing)
+
+    async def score_numpy_array(self, npdata, timeout: float = 30.0):
+        request = predict_pb2.PredictRequest()
+        fill_tensor_proto(request.inputs['images'], npdata, types_pb2.DT_FLOAT)
+        result_tensor = await self.__predict(request, timeout)
+        return writable(make_ndarray(result_tensor))
+
+    async def score_image(self, path: str, timeout: float = 10.0):
+        data = await asyncio.get_running_loop().run_in_executor(None, self._read_file, path)
+        result = await self.score_tensor(data, [1], types_pb2.DT_STRING, timeout)
+        result_ndarray = make_ndarray(result)
+        # result is a batch, but the API only allows a single image so we return the
+        # single item of the batch here
+        return writable(result_ndarray[0])
+
+    async def score_tensor(self, data: bytes, shape: list, datatype, timeout: float = 10.0):
+        request = predict_pb2.PredictRequest()
+        request.inputs['images'].string_val.append(data)
+        request.inputs['images'].dtype = datatype
+        request.inputs['images'].tensor_shape.dim.extend(PredictionClient.make_dim_list(shape))
+        return await self.__predict(request, timeout)
+
+    @staticmethod
+    def _read_file(path: str):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def _sleep(self, delay: float):
+        await asyncio.sleep(delay)
+
+    def _get_grpc_stub(self):
+        if self.__stub is None:
+            self.__channel = self._channel_func()
+            self.__stub = protos.prediction_service_pb2_grpc.PredictionServiceStub(self.__channel)
+        return self.__stub
+
+    async def __predict(self, request, timeout):
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__max_concurrency)
+
+        policy = self._retry_policy
+        deadline = policy.start()
+        attempt = 0
+
+        while(True):
+            try:
+                async with self.__semaphore:
+                    stub = self._get_grpc_stub()
+                    result = await stub.Predict(request, timeout=policy.attempt_timeout(timeout, deadline))
+                return result.outputs["output_alias"]
+            except grpc.RpcError as rpcError:
+                attempt = attempt + 1
+                sleep_delay = policy.next_backoff(rpcError, attempt, deadline)
+                if(sleep_delay is None):
+                    raise
+                if policy.is_connectivity_error(rpcError):
+                    self.__reinitialize_channel(stub, timeout)
+                await self._sleep(sleep_delay)
+                print("Retrying", rpcError)
+
+    def __reinitialize_channel(self, failed_stub, grace: float):
+        # other requests may still be in flight on the failed channel, so it is
+        # only replaced once and closed in the background after a grace period
+        if self.__stub is not failed_stub:
+            return
+        channel = self.__channel
+        self.__stub = None
+        self.__channel = None
+        if channel is not None:
+            task = asyncio.ensure_future(channel.close(grace))
+            self.__closing.add(task)
+            task.add_done_callback(self.__closing.discard)
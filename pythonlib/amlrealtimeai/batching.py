@@ -0,0 +1,131 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .client import PredictionClient
+from .tensor_codec import make_ndarray, writable
+
+from .protos import types_pb2
+
+_STOP = object()
+
+class BatchingPredictionClient:
+    """Groups concurrent score_image calls into batched Predict requests.
+
+    Images submitted from different threads are collected until either
+    max_batch_size images are waiting or the oldest one has waited max_wait_ms,
+    then they are sent as a single request and the output batch is split back
+    to the callers. Up to max_in_flight batches are scored at the same time.
+    """
+
+    def __init__(self, client: PredictionClient, max_batch_size: int = 8, max_wait_ms: float = 5.0, max_in_flight: int = 4):
+        if(client is None):
+            raise ValueError("client")
+
+        if(max_batch_size is None or max_batch_size < 1):
+            raise ValueError("max_batch_size")
+
+        if(max_wait_ms is None or max_wait_ms < 0):
+            raise ValueError("max_wait_ms")
+
+        self.__client = client
+        self.__max_batch_size = max_batch_size
+        self.__max_wait = max_wait_ms / 1000.0
+        self.__queue = queue.Queue()
+        self.__batch_sizes = collections.Counter()
+        self.__batch_sizes_lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.__collector = threading.Thread(target=self.__collect, name="BatchingPredictionClient", daemon=True)
+        self.__closed = False
+        # taken to check __closed and enqueue at once, so nothing is queued behind _STOP
+        self.__closed_lock = threading.Lock()
+        self.__collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def batch_sizes(self):
+        """Number of requests sent so far, keyed by the batch size they carried."""
+        with self.__batch_sizes_lock:
+            return dict(self.__batch_sizes)
+
+    def close(self):
+        with self.__closed_lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__queue.put(_STOP)
+        self.__collector.join()
+        self.__executor.shutdown(wait=True)
+
+    def score_image(self, path: str, timeout: float = 10.0):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return self.submit_image_bytes(data, timeout).result()
+
+    def submit_image_bytes(self, data: bytes, timeout: float = 10.0):
+        """Queues an encoded image and returns a Future for its output."""
+        future = Future()
+        with self.__closed_lock:
+            if self.__closed:
+                raise RuntimeError("client is closed")
+            self.__queue.put((data, timeout, future))
+        return future
+
+    def __collect(self):
+        while(True):
+            item = self.__queue.get()
+            if item is _STOP:
+                return
+
+            batch = [ item ]
+            deadline = time.monotonic() + self.__max_wait
+            stop = False
+            while len(batch) < self.__max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.__queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self.__executor.submit(self.__score_batch, batch)
+            if stop:
+                return
+
+    def __score_batch(self, batch):
+        batch = [ item for item in batch if item[2].set_running_or_notify_cancel() ]
+        if not batch:
+            return
+        futures = [ future for _, _, future in batch ]
+
+        with self.__batch_sizes_lock:
+            self.__batch_sizes[len(batch)] += 1
+
+        try:
+            timeout = max(timeout for _, timeout, _ in batch)
+            result = self.__client.score_tensor([ data for data, _, _ in batch ], [len(batch)], types_pb2.DT_STRING, timeout)
+            # one copy for the whole batch, the items are writable views of it
+            result_ndarray = writable(make_ndarray(result))
+            if len(result_ndarray) != len(batch):
+                raise ValueError("expected a batch of {0} results but got {1}".format(len(batch), len(result_ndarray)))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, item_result in zip(futures, result_ndarray):
+            future.set_result(item_result)
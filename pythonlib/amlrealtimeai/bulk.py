@@ -0,0 +1,315 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bulk scoring of many images with several requests in flight.
+
+Inputs are streamed from a directory, a glob pattern or a manifest file (one
+path per line, or JSON lines with a "path" field). Results are written as they
+arrive, either to a JSON lines file or to .npy shards, and anything already
+written is skipped when the same output is used again, so an interrupted run
+can be resumed.
+"""
+import argparse
+import collections
+import glob
+import json
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from .client import PredictionClient
+from .preprocessing import ImagePreprocessor
+
+_MANIFEST_EXTENSIONS = ('.txt', '.lst', '.jsonl')
+
+def iter_inputs(source: str):
+    """Yields the image paths named by a directory, glob pattern or manifest."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+    elif os.path.isfile(source) and source.lower().endswith(_MANIFEST_EXTENSIONS):
+        yield from _iter_manifest(source)
+    elif os.path.isfile(source):
+        yield source
+    else:
+        yield from glob.iglob(source, recursive=True)
+
+def _iter_manifest(path: str):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                line = entry.get('path') or entry.get('image')
+                if line is None:
+                    raise ValueError("manifest entry has no 'path' field: {0}".format(entry))
+            yield line if os.path.isabs(line) else os.path.join(base, line)
+
+class JsonlResultWriter:
+    """Appends one JSON object per scored image to a file."""
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__file = None
+
+    def completed(self):
+        """Paths that already have a result in the output file."""
+        done = set()
+        if os.path.exists(self.__path):
+            with open(self.__path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a partially written last line from an interrupted run
+                        continue
+                    if 'output' in entry:
+                        done.add(entry['path'])
+        return done
+
+    def write(self, path: str, output):
+        self.__write({ 'path': path, 'output': np.asarray(output).tolist() })
+
+    def write_error(self, path: str, error):
+        self.__write({ 'path': path, 'error': str(error) })
+
+    def __write(self, entry):
+        if self.__file is None:
+            self.__file = open(self.__path, 'a', encoding='utf-8')
+        self.__file.write(json.dumps(entry) + '\n')
+        self.__file.flush()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+class NpyShardResultWriter:
+    """Stacks outputs into shard-NNNNN.npy files of shard_size rows.
+
+    Next to every shard, shard-NNNNN.jsonl lists the input path of each row.
+    Failed inputs are listed in errors.jsonl.
+    """
+
+    def __init__(self, directory: str, shard_size: int = 10000):
+        if(shard_size is None or shard_size < 1):
+            raise ValueError("shard_size")
+        self.__directory = directory
+        self.__shard_size = shard_size
+        self.__paths = []
+        self.__outputs = []
+        self.__next_shard = None
+        self.__errors = None
+
+    def completed(self):
+        done = set()
+        shard = 0
+        for index_path in sorted(glob.glob(os.path.join(self.__directory, 'shard-*.jsonl'))):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                done.update(json.loads(line)['path'] for line in f if line.strip())
+            shard = max(shard, int(os.path.basename(index_path)[6:-6]) + 1)
+        self.__next_shard = shard
+        return done
+
+    def write(self, path: str, output):
+        self.__paths.append(path)
+        self.__outputs.append(np.asarray(output))
+        if len(self.__paths) >= self.__shard_size:
+            self.__flush()
+
+    def write_error(self, path: str, error):
+        if self.__errors is None:
+            os.makedirs(self.__directory, exist_ok=True)
+            self.__errors = open(os.path.join(self.__directory, 'errors.jsonl'), 'a', encoding='utf-8')
+        self.__errors.write(json.dumps({ 'path': path, 'error': str(error) }) + '\n')
+        self.__errors.flush()
+
+    def __flush(self):
+        if not self.__paths:
+            return
+        if self.__next_shard is None:
+            self.completed()
+        os.makedirs(self.__directory, exist_ok=True)
+        name = os.path.join(self.__directory, 'shard-{0:05d}'.format(self.__next_shard))
+        np.save(name + '.npy', np.stack(self.__outputs))
+        # the index is written last, a shard only counts as done once it exists
+        with open(name + '.jsonl', 'w', encoding='utf-8') as f:
+            for path in self.__paths:
+                f.write(json.dumps({ 'path': path }) + '\n')
+        self.__next_shard += 1
+        self.__paths = []
+        self.__outputs = []
+
+    def close(self):
+        self.__flush()
+        if self.__errors is not None:
+            self.__errors.close()
+            self.__errors = None
+
+class BulkScorer:
+    """Scores a stream of image paths keeping max_in_flight requests busy.
+
+    If the client has a preprocessor, the images are scored with
+    score_images, which preprocesses them in processes worker processes.
+    Latencies are then not reported, as requests are not timed one by one,
+    and the script creating the scorer needs an if __name__ == '__main__'
+    guard (see PredictionClient.score_images).
+    """
+
+    def __init__(self, client: PredictionClient, max_in_flight: int = 16, timeout: float = 10.0, processes: int = None):
+        if(client is None):
+            raise ValueError("client")
+
+        if(max_in_flight is None or max_in_flight < 1):
+            raise ValueError("max_in_flight")
+
+        self.__client = client
+        self.__max_in_flight = max_in_flight
+        self.__timeout = timeout
+        self.__processes = processes
+
+    def __score(self, path):
+        start = time.perf_counter()
+        output = self.__client.score_image(path, self.__timeout)
+        return output, time.perf_counter() - start
+
+    def __run_in_threads(self, paths, record):
+        with ThreadPoolExecutor(max_workers=self.__max_in_flight) as executor:
+            in_flight = {}
+
+            def drain():
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = in_flight.pop(future)
+                    try:
+                        output, latency = future.result()
+                    except Exception as e:
+                        record(path, error=e)
+                        continue
+                    record(path, output, latency)
+
+            for path in paths:
+                if len(in_flight) >= self.__max_in_flight:
+                    drain()
+                in_flight[executor.submit(self.__score, path)] = path
+
+            while in_flight:
+                drain()
+
+    def __run_in_processes(self, paths, record):
+        paths = iter(paths)
+        # paths score_images has taken but not returned a result for yet, oldest first
+        taken = collections.deque()
+
+        def take():
+            for path in paths:
+                taken.append(path)
+                yield path
+
+        while True:
+            try:
+                for output in self.__client.score_images(take(), self.__processes, self.__max_in_flight, self.__timeout):
+                    record(taken.popleft(), output)
+                return
+            except BrokenProcessPool:
+                # the workers died, e.g. the script has no __main__ guard, which no retry fixes
+                raise
+            except Exception:
+                # score_images stops at the first error, which may come from any image it had
+                # taken, e.g. one being preprocessed; those are scored one by one to find it
+                while taken:
+                    path = taken.popleft()
+                    try:
+                        output = self.__client.score_image(path, self.__timeout)
+                    except Exception as e:
+                        record(path, error=e)
+                        continue
+                    record(path, output)
+
+    def run(self, paths, writer, resume: bool = True):
+        """Scores every path not already in the writer's output and returns a summary dict."""
+        done = writer.completed() if resume else set()
+        latencies = []
+        scored = failed = skipped = 0
+        start = time.perf_counter()
+
+        def record(path, output=None, latency=None, error=None):
+            nonlocal scored, failed
+            if error is not None:
+                writer.write_error(path, error)
+                failed += 1
+                return
+            writer.write(path, output)
+            if latency is not None:
+                latencies.append(latency)
+            scored += 1
+
+        def pending():
+            nonlocal skipped
+            for path in paths:
+                if path in done:
+                    skipped += 1
+                    continue
+                yield path
+
+        try:
+            if self.__client.preprocessor is not None:
+                self.__run_in_processes(pending(), record)
+            else:
+                self.__run_in_threads(pending(), record)
+        finally:
+            # results written so far are kept on Ctrl-C or an error, so the run can be resumed
+            writer.close()
+        elapsed = time.perf_counter() - start
+        summary = { 'scored': scored, 'failed': failed, 'skipped': skipped, 'elapsed_s': elapsed,
+                    'images_per_s': scored / elapsed if elapsed > 0 else 0.0 }
+        if latencies:
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+            summary.update({ 'latency_p50_ms': p50, 'latency_p90_ms': p90, 'latency_p99_ms': p99 })
+        return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score images in bulk')
+    parser.add_argument('host', type=str,
+                        help='Host to score against')
+    parser.add_argument('images', nargs='+', type=str,
+                        help='Image files, directories, glob patterns or manifest files to score')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Port to score against, defaults to 443 with SSL and 80 without')
+    parser.add_argument('--ssl', action='store_true', help='Use SSL to Score')
+    parser.add_argument('--key', type=str, default='', help='Auth key to use to score - only works with SSL')
+    parser.add_argument('--output', type=str, default='results.jsonl',
+                        help='JSON lines file, or a directory of .npy shards with --format npy')
+    parser.add_argument('--format', choices=['jsonl', 'npy'], default='jsonl')
+    parser.add_argument('--shard-size', type=int, default=10000, help='Rows per .npy shard')
+    parser.add_argument('--max-in-flight', type=int, default=16, help='Number of concurrent requests')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Timeout of each request in seconds')
+    parser.add_argument('--no-resume', action='store_true', help='Score inputs even if the output already has them')
+    parser.add_argument('--resize', type=int, default=None,
+                        help='Resize and center-crop images to this size and send them as JPEG, requires Pillow')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes resizing images with --resize, defaults to one per CPU')
+    args = parser.parse_args(argv)
+
+    port = args.port if args.port is not None else (443 if args.ssl else 80)
+    preprocessor = ImagePreprocessor(args.resize) if args.resize is not None else None
+    client = PredictionClient(args.host, port, args.ssl, args.key, preprocessor=preprocessor)
+    if args.format == 'npy':
+        writer = NpyShardResultWriter(args.output, args.shard_size)
+    else:
+        writer = JsonlResultWriter(args.output)
+
+    paths = (path for source in args.images for path in iter_inputs(source))
+    summary = BulkScorer(client, args.max_in_flight, args.timeout, args.processes).run(paths, writer, not args.no_resume)
+    for key, value in summary.items():
+        print("{0}: {1}".format(key, round(value, 3) if isinstance(value, float) else value))
+    return summary
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Result cache for repeated scoring requests.
+
+Results are keyed by a hash of the input, the names of the tensors involved
+and the endpoint and model that computed them, so one cache can be shared by
+clients of different deployments. They are kept in a bounded in-memory LRU
+with an optional time to live. With a directory, results evicted from memory
+can still be served from .npy files on disk. Concurrent requests for the same
+key are coalesced, so only one of them reaches the service.
+"""
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
+
+class ResultCache:
+    """Results of scoring requests, in memory and optionally on disk.
+
+    max_disk_bytes bounds the size of the .npy files in directory; the least
+    recently used are removed first. Without it the directory grows without
+    limit. Files written to the same directory by other processes are only
+    counted once this cache reads them.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: timedelta = None, directory: str = None, max_disk_bytes: int = None):
+        if(max_entries is None or max_entries < 1):
+            raise ValueError("max_entries")
+
+        if(max_disk_bytes is not None and max_disk_bytes < 1):
+            raise ValueError("max_disk_bytes")
+
+        self.__max_entries = max_entries
+        self.__ttl = ttl.total_seconds() if ttl is not None else None
+        self.__directory = directory
+        self.__max_disk_bytes = max_disk_bytes
+        # sizes of the files on disk by key, least recently used first
+        self.__files = OrderedDict()
+        self.__disk_bytes = 0
+        self.__entries = OrderedDict()
+        self.__in_flight = {}
+        self.__lock = threading.Lock()
+        self.__stats = { 'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0,
+                         'expirations': 0, 'coalesced': 0 }
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            if max_disk_bytes is not None:
+                self.__scan_directory()
+
+    @staticmethod
+    def make_key(*parts):
+        """Hashes bytes, strings and NumPy arrays into a cache key.
+
+        Arrays of objects may only hold bytes or strings, TypeError is raised otherwise.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                # dtype and shape are part of the key, the same bytes can mean different inputs
+                digest.update("{0}{1}".format(part.dtype.str, part.shape).encode('utf-8'))
+                if part.dtype.hasobject:
+                    # the buffer of an object array holds pointers, the elements are hashed instead
+                    for item in part.flat:
+                        ResultCache.__update_with_item(digest, item)
+                else:
+                    digest.update(np.ascontiguousarray(part))
+            elif isinstance(part, str):
+                digest.update(part.encode('utf-8'))
+            else:
+                digest.update(part)
+            # separator so that ('ab', 'c') and ('a', 'bc') differ
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def __update_with_item(digest, item):
+        if isinstance(item, str):
+            item = item.encode('utf-8')
+        if not isinstance(item, bytes):
+            raise TypeError("cannot make a cache key of an array holding {0}".format(type(item).__name__))
+        # length prefix so that [b'ab', b'c'] and [b'a', b'bc'] differ
+        digest.update(len(item).to_bytes(8, 'little'))
+        digest.update(item)
+
+    @property
+    def stats(self):
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['entries'] = len(self.__entries)
+            stats['disk_bytes'] = self.__disk_bytes
+            return stats
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def get(self, key: str):
+        """Returns the cached result or None."""
+        with self.__lock:
+            value = self.__get_from_memory(key)
+            if value is not None:
+                self.__stats['hits'] += 1
+                return value
+
+        value, stored_at = self.__get_from_disk(key)
+        with self.__lock:
+            if value is None:
+                self.__stats['misses'] += 1
+                return None
+            self.__stats['disk_hits'] += 1
+            # the time to live still counts from when the result was written
+            self.__put_in_memory(key, value, stored_at)
+            return value
+
+    def put(self, key: str, value):
+        value = np.asarray(value)
+        if value.flags.writeable:
+            # callers share cached arrays, so they must not be able to change them
+            value = value.copy()
+            value.setflags(write=False)
+        with self.__lock:
+            self.__put_in_memory(key, value)
+        self.__put_on_disk(key, value)
+        return value
+
+    def get_or_compute(self, key: str, compute):
+        """Returns the cached result, or calls compute() once however many threads ask for it."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.__lock:
+            # another thread may have stored it since the lookup above
+            value = self.__get_from_memory(key)
+            if value is not None:
+                self.__stats['hits'] += 1
+                return value
+            future = self.__in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.__in_flight[key] = future
+            else:
+                self.__stats['coalesced'] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = self.put(key, compute())
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self.__lock:
+                del self.__in_flight[key]
+
+    def __expired(self, stored_at):
+        return self.__ttl is not None and time.monotonic() - stored_at > self.__ttl
+
+    def __get_from_memory(self, key):
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if self.__expired(stored_at):
+            del self.__entries[key]
+            self.__stats['expirations'] += 1
+            return None
+        self.__entries.move_to_end(key)
+        return value
+
+    def __put_in_memory(self, key, value, stored_at: float = None):
+        self.__entries[key] = (value, stored_at if stored_at is not None else time.monotonic())
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+            self.__stats['evictions'] += 1
+
+    def __path(self, key):
+        return os.path.join(self.__directory, key[:2], key + '.npy')
+
+    def __get_from_disk(self, key):
+        """Returns the value and when it was stored, on the time.monotonic() clock, or (None, None)."""
+        if self.__directory is None:
+            return None, None
+        path = self.__path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.__ttl is not None and age > self.__ttl:
+                os.remove(path)
+                with self.__lock:
+                    self.__disk_bytes -= self.__files.pop(key, 0)
+                    self.__stats['expirations'] += 1
+                return None, None
+            value = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None, None
+        if self.__max_disk_bytes is not None:
+            with self.__lock:
+                self.__track_file(key, path)
+        value.setflags(write=False)
+        return value, time.monotonic() - max(0.0, age)
+
+    def __put_on_disk(self, key, value):
+        if self.__directory is None or value.dtype.hasobject:
+            return
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written under a temporary name so readers never see a partial file
+        temporary = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.get_ident())
+        with open(temporary, 'wb') as f:
+            np.save(f, value, allow_pickle=False)
+        os.replace(temporary, path)
+        if self.__max_disk_bytes is not None:
+            with self.__lock:
+                self.__track_file(key, path)
+                self.__evict_files()
+
+    def __scan_directory(self):
+        files = []
+        for root, _, names in os.walk(self.__directory):
+            for name in names:
+                if name.endswith('.npy'):
+                    path = os.path.join(root, name)
+                    files.append((os.path.getmtime(path), name[:-len('.npy')], path))
+        for _, key, path in sorted(files):
+            self.__track_file(key, path)
+        self.__evict_files()
+
+    def __track_file(self, key, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.__disk_bytes += size - self.__files.pop(key, 0)
+        self.__files[key] = size
+
+    def __evict_files(self):
+        while self.__disk_bytes > self.__max_disk_bytes and self.__files:
+            key, size = self.__files.popitem(last=False)
+            self.__disk_bytes -= size
+            self.__stats['disk_evictions'] += 1
+            try:
+                os.remove(self.__path(key))
+            except OSError:
+                pass
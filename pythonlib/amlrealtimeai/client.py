@@ -1,29 +1,29 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
+import collections
 import numpy as np
-import tensorflow as tf
-import tensorflow.contrib
 import grpc
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-try:
-    from tensorflow_serving.apis import predict_pb2
-    from tensorflow_serving.apis import prediction_service_pb2_grpc
-except ImportError:
-    from .external.tensorflow_serving.apis import predict_pb2
-    from .external.tensorflow_serving.apis import prediction_service_pb2_grpc
+from .cache import ResultCache
+from .metrics import ClientMetrics, NULL_CALL
+from .preprocessing import ImagePreprocessor, preprocess_file
+from .retry import RetryBudget, RetryPolicy
+from .signature import ModelSignature
+from .tensor_codec import fill_tensor_proto, make_ndarray, to_numpy_dtype, writable
 
-try:
-    from tensorflow.core.framework import tensor_shape_pb2
-    from tensorflow.core.framework import types_pb2
-except ImportError:
-    from .external.tensorflow.core.framework import tensor_shape_pb2
-    from .external.tensorflow.core.framework import types_pb2
+from . import protos
+from .protos import predict_pb2, tensor_shape_pb2, types_pb2
 
 class PredictionClient:
 
-    def __init__(self, address: str, port: int, use_ssl:bool = False, access_token:str = "", channel_shutdown_timeout:timedelta = timedelta(minutes=2)):
+    def __init__(self, address: str, port: int, use_ssl:bool = False, access_token:str = "", channel_shutdown_timeout:timedelta = timedelta(minutes=2),
+                 metrics:ClientMetrics = None, cache:ResultCache = None, retry_policy:RetryPolicy = None,
+                 preprocessor:ImagePreprocessor = None):
         if(address is None):
             raise ValueError("address")
 
@@ -35,31 +35,289 @@ class PredictionClient:
         grpc.composite_channel_credentials(grpc.ssl_channel_credentials(),
                                            grpc.metadata_call_credentials(metadata_transormer))
 
-        if use_ssl:
-            self._channel_func = lambda: grpc.secure_channel(host, grpc.ssl_channel_credentials())
-        else:
-            self._channel_func = lambda: grpc.insecure_channel(host)
+        self._channel_func = self._make_channel_func(host, use_ssl)
+        # cached results are only valid for the deployment that computed them
+        self._cache_scope = host
 
         self.__channel_shutdown_timeout = channel_shutdown_timeout
         self.__channel_usable_until = None
         self.__channel = None
+        self.__channel_generation = 0
+        self.__stub = None
+        # replaced channels with the timers that close them once their calls had time to finish
+        self.__replaced_channels = {}
+        # the client may be shared by several threads, e.g. by BulkScorer
+        self.__channel_lock = threading.Lock()
+        self._metrics = metrics
+        self._cache = cache
+        self._retry_policy = retry_policy if retry_policy is not None else RetryPolicy(budget=RetryBudget())
+        self._preprocessor = preprocessor
+        # default number of requests _predict_many keeps in flight
+        self._max_in_flight = 4
+        # model signatures by (model name, signature name), valid for the channel they were fetched on
+        self.__signatures = {}
+        self.__signatures_generation = None
+        self.__signatures_lock = threading.Lock()
+
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def preprocessor(self):
+        return self._preprocessor
+
+    def score_numpy_array(self, npdata, timeout: float = 30.0, datatype = types_pb2.DT_FLOAT):
+        if self._cache is not None:
+            npdata = self.__check_datatype(npdata, datatype)
+            key = self._cache_key('score_numpy_array', 'images', 'output_alias',
+                                  np.asarray(npdata, dtype=to_numpy_dtype(datatype)))
+            # cached results are shared and read-only, every caller gets its own copy
+            return writable(self._cache.get_or_compute(key, lambda: self.__score_numpy_array(npdata, timeout, datatype)))
+        return writable(self.__score_numpy_array(npdata, timeout, datatype))
 
+    def _cache_key(self, method: str, *parts, model_name: str = "", signature_name: str = ""):
+        # score_numpy_array and score_image leave model_spec empty, i.e. they call the
+        # default model and signature of the server
+        return self._cache.make_key(method, self._cache_scope, model_name, signature_name, *parts)
 
-    def score_numpy_array(self, npdata):
+    def __score_numpy_array(self, npdata, timeout: float, datatype):
+        call = self._start_call()
+        request = self.__make_numpy_request(npdata, datatype)
+        call.serialized(request)
+        result_tensor = self._predict(request, timeout, call)
+        result_ndarray = make_ndarray(result_tensor)
+        call.deserialized(result_tensor)
+        return result_ndarray
+
+    @staticmethod
+    def __check_datatype(npdata, datatype):
+        # the values are cast to datatype, e.g. float data sent as DT_UINT8 would be truncated and wrapped
+        npdata = np.asarray(npdata)
+        if(datatype != types_pb2.DT_STRING and not np.can_cast(npdata.dtype, to_numpy_dtype(datatype), casting='same_kind')):
+            raise ValueError("cannot send {0} data as {1}".format(npdata.dtype, types_pb2.DataType.Name(datatype)))
+        return npdata
+
+    @staticmethod
+    def __make_numpy_request(npdata, datatype):
         request = predict_pb2.PredictRequest()
-        request.inputs['images'].CopyFrom(tf.contrib.util.make_tensor_proto(npdata, types_pb2.DT_FLOAT, npdata.shape))
-        result_tensor = self.__predict(request, 30.0)
-        return tf.contrib.util.make_ndarray(result_tensor)
+        fill_tensor_proto(request.inputs['images'], PredictionClient.__check_datatype(npdata, datatype), datatype)
+        return request
+
+    def score_numpy_arrays(self, arrays, timeout: float = 30.0, datatype = types_pb2.DT_FLOAT, max_in_flight: int = None):
+        """Scores every array of arrays in its own request and returns the results in order.
+
+        Like score_numpy_batches, raises ValueError unless the arrays can be
+        cast to datatype as 'same_kind'.
+        """
+        requests = (self.__make_numpy_request(npdata, datatype) for npdata in arrays)
+        return [ writable(make_ndarray(result_tensor)) for result_tensor in self._predict_many(requests, timeout, max_in_flight) ]
+
+    def score_numpy_batches(self, data, batch_size: int = 64, max_in_flight: int = None, out = None, out_path: str = None,
+                            datatype = types_pb2.DT_FLOAT, timeout: float = 30.0):
+        """Scores a large array in chunks of batch_size rows along the first axis.
+
+        data is an array or the path of a .npy file, which is memory-mapped
+        rather than loaded. Up to max_in_flight chunks are scored at the same
+        time and every output is copied straight into its rows of the result,
+        which is out if given, a new .npy file memory-mapped at out_path, or a
+        new array. datatype is the type sent on the wire, e.g. DT_HALF halves
+        the payload of float32 inputs and DT_UINT8 suits 8-bit image data. The
+        values are cast on the way, so ValueError is raised unless NumPy
+        allows the cast as 'same_kind': float data cannot be sent as integers.
+        """
+        if(batch_size is None or batch_size < 1):
+            raise ValueError("batch_size")
+
+        if isinstance(data, str):
+            data = np.load(data, mmap_mode='r')
+        # only the dtype is checked, a memory-mapped file is not read
+        data = self.__check_datatype(data, datatype)
+        rows = len(data)
+
+        # slicing only creates views, each chunk is copied once into its request
+        requests = (self.__make_numpy_request(data[start:start + batch_size], datatype) for start in range(0, rows, batch_size))
+        start = 0
+        for result_tensor in self._predict_many(requests, timeout, max_in_flight):
+            result = make_ndarray(result_tensor)
+            count = min(batch_size, rows - start)
+            if(result.ndim == 0 or len(result) != count):
+                raise ValueError("expected {0} output rows for input rows {1} to {2} but got {3}".format(
+                    count, start, start + count, len(result) if result.ndim else 0))
+            if out is None:
+                shape = (rows,) + result.shape[1:]
+                if out_path is not None:
+                    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=result.dtype, shape=shape)
+                else:
+                    out = np.empty(shape, dtype=result.dtype)
+            out[start:start + count] = result
+            start += count
+
+        if out is None:
+            out = np.empty((0,), dtype=np.float32)
+        elif isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    def get_model_signature(self, signature_name: str = None, model_name: str = "", timeout: float = 10.0):
+        """Returns the ModelSignature the service reports through GetModelMetadata.
+
+        It is fetched once per channel and cached until the channel is
+        rebuilt, e.g. after the service became unavailable.
+        """
+        key = (model_name, signature_name)
+        with self.__signatures_lock:
+            if self.__signatures_generation != self._channel_generation:
+                self.__signatures.clear()
+            signature = self.__signatures.get(key)
+        if signature is not None:
+            return signature
+
+        request = protos.get_model_metadata_pb2.GetModelMetadataRequest()
+        request.model_spec.name = model_name
+        request.metadata_field.append('signature_def')
+        response = self._call('GetModelMetadata', request, timeout)
+        signature = ModelSignature.from_metadata_response(response, signature_name)
+        with self.__signatures_lock:
+            if self.__signatures_generation != self._channel_generation:
+                self.__signatures.clear()
+                self.__signatures_generation = self._channel_generation
+            self.__signatures[key] = signature
+        return signature
+
+    def score(self, inputs: dict, outputs: list = None, timeout: float = 30.0, validate: bool = True,
+              signature_name: str = None, model_name: str = ""):
+        """Scores a model with any number of named inputs and returns a dict of its outputs.
+
+        inputs maps input aliases to arrays, outputs lists the aliases of the
+        outputs to fetch, all of them by default. With validate, the inputs
+        are checked against the model signature and sent as the types it
+        declares, so mistakes raise a ValueError without calling Predict.
+        Without it, every input is sent as the type of its array; services
+        that do not implement GetModelMetadata need validate=False.
+        """
+        if(inputs is None or len(inputs) == 0):
+            raise ValueError("inputs")
+
+        datatypes = {}
+        if validate:
+            signature = self.get_model_signature(signature_name, model_name, timeout)
+            inputs = signature.check_inputs(inputs)
+            if outputs is not None:
+                signature.check_outputs(outputs)
+            datatypes = { alias: spec.datatype for alias, spec in signature.inputs.items() }
+
+        call = self._start_call()
+        request = predict_pb2.PredictRequest()
+        request.model_spec.name = model_name
+        if signature_name is not None:
+            request.model_spec.signature_name = signature_name
+        for alias, values in inputs.items():
+            fill_tensor_proto(request.inputs[alias], values, datatypes.get(alias))
+        if outputs is not None:
+            request.output_filter.extend(outputs)
+        call.serialized(request)
+        response = self._predict(request, timeout, call, output=None)
+        results = { alias: writable(make_ndarray(tensor)) for alias, tensor in response.outputs.items() }
+        call.deserialized(response)
+        return results
 
     def score_image(self, path: str, timeout: float = 10.0):
         with open(path, 'rb') as f:
             data = f.read()
-            result = self.score_tensor(data, [1], types_pb2.DT_STRING, timeout) #7 is dt_string
-            result_ndarray = tf.contrib.util.make_ndarray(result)
-            # result is a batch, but the API only allows a single image so we return the
-            # single item of the batch here
-            return result_ndarray[0]
+        if self._cache is not None:
+            key = self._cache_key('score_image', 'images', 'output_alias', repr(self._preprocessor), data)
+            return writable(self._cache.get_or_compute(key, lambda: self.__score_image(data, timeout)))
+        return writable(self.__score_image(data, timeout))
 
+    def __score_image(self, data: bytes, timeout: float):
+        if self._preprocessor is not None:
+            data = self._preprocessor(data)
+        call = self._start_call()
+        if isinstance(data, bytes):
+            result = self._score_tensor(data, [1], types_pb2.DT_STRING, timeout, call) #7 is dt_string
+        else:
+            request = self.__make_image_request(data)
+            call.serialized(request)
+            result = self._predict(request, timeout, call)
+        result_ndarray = make_ndarray(result)
+        call.deserialized(result)
+        # result is a batch, but the API only allows a single image so we return the
+        # single item of the batch here
+        return result_ndarray[0]
+
+    def score_images(self, paths, processes: int = None, max_in_flight: int = None, timeout: float = 10.0):
+        """Yields the result of every image in paths, in order.
+
+        With a preprocessor, images are read and preprocessed by a pool of
+        processes worker processes (one per CPU by default) while earlier
+        images are being scored, and only the processed images are sent. The
+        cache is not consulted.
+
+        The workers are started with the 'spawn' method, so they import the
+        main module of the program again. A script calling score_images with
+        a preprocessor must therefore do so under
+        if __name__ == '__main__':, otherwise the pool fails with
+        BrokenProcessPool.
+        """
+        if max_in_flight is None:
+            max_in_flight = self._max_in_flight
+        if self._preprocessor is None:
+            images = (self.__read_file(path) for path in paths)
+        else:
+            images = self.__preprocess_files(paths, processes, max_in_flight)
+        requests = (self.__make_image_request(image) for image in images)
+        for result_tensor in self._predict_many(requests, timeout, max_in_flight):
+            yield writable(make_ndarray(result_tensor)[0])
+
+    @staticmethod
+    def __read_file(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def __preprocess_files(self, paths, processes, max_in_flight):
+        # multiprocessing is only imported when it is needed
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        processes = processes or os.cpu_count() or 1
+        # forking once gRPC has started its threads can deadlock the children, spawned
+        # workers only import the preprocessing module
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            # enough work is queued to keep the workers and the requests in flight busy,
+            # but the paths are not all submitted up front
+            ahead = processes + max_in_flight
+            pending = collections.deque()
+            for path in paths:
+                if len(pending) >= ahead:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(preprocess_file, self._preprocessor, path))
+            while pending:
+                yield pending.popleft().result()
+
+    @staticmethod
+    def __make_image_request(image):
+        request = predict_pb2.PredictRequest()
+        if isinstance(image, bytes):
+            request.inputs['images'].string_val.append(image)
+            request.inputs['images'].dtype = types_pb2.DT_STRING
+            request.inputs['images'].tensor_shape.dim.add().size = 1
+        else:
+            # a decoded image gets a batch dimension of one
+            fill_tensor_proto(request.inputs['images'], image[np.newaxis])
+        return request
+
+
+    @staticmethod
+    def _make_channel_func(host: str, use_ssl: bool, options: list = None):
+        if use_ssl:
+            return lambda: grpc.secure_channel(host, grpc.ssl_channel_credentials(), options=options)
+        return lambda: grpc.insecure_channel(host, options=options)
 
     @staticmethod
     def make_dim_list(shape:list):
@@ -71,41 +329,178 @@ class PredictionClient:
         return ret_list
 
     def score_tensor(self, data: bytes, shape: list, datatype, timeout: float = 10.0):
+        call = self._start_call()
+        result = self._score_tensor(data, shape, datatype, timeout, call)
+        call.finished(result)
+        return result
+
+    def _score_tensor(self, data, shape, datatype, timeout, call):
         request = predict_pb2.PredictRequest()
-        request.inputs['images'].string_val.append(data)
+        if isinstance(data, bytes):
+            request.inputs['images'].string_val.append(data)
+        else:
+            # a list of encoded items, one per entry of the batch dimension
+            request.inputs['images'].string_val.extend(data)
         request.inputs['images'].dtype = datatype
         request.inputs['images'].tensor_shape.dim.extend(self.make_dim_list(shape))
-        return self.__predict(request, timeout)
+        call.serialized(request)
+        return self._predict(request, timeout, call)
+
+    def _start_call(self):
+        # NULL_CALL keeps the cost of disabled metrics to a few no-op calls
+        if self._metrics is None:
+            return NULL_CALL
+        return self._metrics.start_call()
 
     def _get_datetime_now(self):
         return datetime.now()
 
+    def connect(self, timeout: float = 10.0):
+        """Opens the channel now rather than on the first call.
+
+        Raises grpc.FutureTimeoutError if the connection is not ready within
+        timeout seconds.
+        """
+        with self.__channel_lock:
+            self.__ensure_channel()
+            channel = self.__channel
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+
+    def close(self):
+        with self.__channel_lock:
+            if self.__channel is not None:
+                self.__channel.close()
+            self.__channel = None
+            self.__stub = None
+            replaced, self.__replaced_channels = self.__replaced_channels, {}
+        for channel, timer in replaced.items():
+            timer.cancel()
+            channel.close()
+        with self.__signatures_lock:
+            self.__signatures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _get_grpc_stub(self):
-        if(self.__channel_usable_until is None or self.__channel_usable_until < self._get_datetime_now()):
+        with self.__channel_lock:
+            self.__ensure_channel()
+            return self.__stub
+
+    def __ensure_channel(self):
+        # without channel_shutdown_timeout the channel is kept however long it is idle
+        now = self._get_datetime_now()
+        if(self.__channel is None or (self.__channel_usable_until is not None and self.__channel_usable_until < now)):
             self.__reinitialize_channel()
-        self.__channel_usable_until = self._get_datetime_now() + self.__channel_shutdown_timeout
-        return self.__stub
+        if self.__channel_shutdown_timeout is not None:
+            self.__channel_usable_until = now + self.__channel_shutdown_timeout
+
+    @property
+    def _channel_generation(self):
+        """Number of times the channel was created, tells calls made on an older channel apart."""
+        return self.__channel_generation
+
+    def __close_replaced_channel(self, channel):
+        with self.__channel_lock:
+            # close() may have closed it already
+            if self.__replaced_channels.pop(channel, None) is None:
+                return
+        channel.close()
+
+    def _predict_many(self, requests, timeout, max_in_flight: int = None):
+        """Yields the output tensor of every request in order with up to max_in_flight requests in flight.
+
+        Requests are pulled from the iterable only as slots free up, so a
+        generator of requests is never built far ahead of the responses.
+        """
+        if max_in_flight is None:
+            max_in_flight = self._max_in_flight
+        if(max_in_flight < 1):
+            raise ValueError("max_in_flight")
+
+        def predict(request, call):
+            result = self._predict(request, timeout, call)
+            call.finished(result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            pending = collections.deque()
+            requests = iter(requests)
+            while True:
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+                call = self._start_call()
+                request = next(requests, None)
+                if request is None:
+                    break
+                call.serialized(request)
+                pending.append(executor.submit(predict, request, call))
+            while pending:
+                yield pending.popleft().result()
+
+    def _predict(self, request, timeout, call=NULL_CALL, output: str = "output_alias"):
+        """Returns the output tensor named output, or the whole PredictResponse if output is None."""
+        result = self._call('Predict', request, timeout, call)
+        return result if output is None else result.outputs[output]
+
+    def _call(self, method: str, request, timeout, call=NULL_CALL, attempt: int = 0, deadline=None):
+        """Calls method with retries.
 
-    def __predict(self, request, timeout):
-        retry_count = 5
-        sleep_delay = 1
+        attempt and deadline continue a call whose first attempts were made
+        elsewhere, e.g. by PipelinedPredictionClient, so that it still gets
+        max_attempts in all and ends by the deadline its first attempt started.
+        """
+        policy = self._retry_policy
+        if attempt == 0:
+            deadline = policy.start()
 
         while(True):
+            stub = self._get_grpc_stub()
             try:
-                result = self._get_grpc_stub().Predict(request, timeout)
-                return result.outputs["output_alias"]
+                result = getattr(stub, method)(request, policy.attempt_timeout(timeout, deadline))
+                call.received()
+                return result
             except grpc.RpcError as rpcError:
-                retry_count = retry_count - 1
-                if(retry_count <= 0):
+                attempt = attempt + 1
+                if policy.is_cancelled(rpcError) and self.__stub is not stub:
+                    # another call replaced the channel while this one was in flight, it is resent at once
+                    if(attempt >= policy.max_attempts):
+                        call.failed()
+                        raise
+                    call.retried()
+                    continue
+                sleep_delay = policy.next_backoff(rpcError, attempt, deadline)
+                if(sleep_delay is None):
+                    call.failed()
                     raise
+                call.retried()
                 time.sleep(sleep_delay)
-                sleep_delay = sleep_delay * 2
                 print("Retrying", rpcError)
-                self.__reinitialize_channel()
+                # other failures leave the connection usable, so the channel is kept
+                if policy.is_connectivity_error(rpcError):
+                    with self.__channel_lock:
+                        # the client is shared by several threads, only the first to see
+                        # the channel fail replaces it
+                        if self.__stub is stub:
+                            # calls of other threads may still complete on the old channel
+                            self.__reinitialize_channel(grace=timeout)
 
-    def __reinitialize_channel(self):
+    def __reinitialize_channel(self, grace: float = None):
+        """Replaces the channel; the old one is closed at once, or after grace seconds."""
+        if self._metrics is not None and self.__channel is not None:
+            self._metrics.record_channel_reinitialization()
         self.__stub = None
         if self.__channel is not None:
-            self.__channel.close()
+            if grace is None:
+                self.__channel.close()
+            else:
+                timer = threading.Timer(grace, self.__close_replaced_channel, (self.__channel,))
+                timer.daemon = True
+                self.__replaced_channels[self.__channel] = timer
+                timer.start()
         self.__channel = self._channel_func()
-        self.__stub = prediction_service_pb2_grpc.PredictionServiceStub(self.__channel)
+        self.__channel_generation += 1
+        self.__stub = protos.prediction_service_pb2_grpc.PredictionServiceStub(self.__channel)
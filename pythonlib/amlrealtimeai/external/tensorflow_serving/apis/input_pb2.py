@@ -12,10 +12,7 @@ from google.protobuf import descriptor_pb2
 
 _sym_db = _symbol_database.Default()
 
-try:
-  from tensorflow.core.example import example_pb2 as tensorflow_dot_core_dot_example_dot_example__pb2
-except ImportError:
-  from ...tensorflow.core.example import example_pb2 as tensorflow_dot_core_dot_example_dot_example__pb2
+from ...tensorflow.core.example import example_pb2 as tensorflow_dot_core_dot_example_dot_example__pb2
 
 
 DESCRIPTOR = _descriptor.FileDescriptor(
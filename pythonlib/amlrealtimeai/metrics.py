@@ -0,0 +1,216 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Latency and throughput instrumentation for the prediction clients.
+
+Pass a ClientMetrics to PredictionClient(metrics=...) to time every call,
+split into serialization, the gRPC wait and deserialization, and to count
+retries, channel reinitializations and payload bytes. Without it the client
+uses NULL_CALL, whose methods do nothing.
+"""
+import threading
+import time
+
+class LatencyHistogram:
+    """Log-linear histogram in the style of HdrHistogram.
+
+    Values are non-negative integers (e.g. microseconds or bytes). Every power
+    of two is split into sub_buckets linear buckets, so a recorded value is
+    off by at most 1/sub_buckets of itself, whatever its magnitude.
+    """
+
+    def __init__(self, sub_buckets: int = 64):
+        if(sub_buckets < 2 or sub_buckets & (sub_buckets - 1)):
+            raise ValueError("sub_buckets must be a power of two")
+        self.__sub_buckets = sub_buckets
+        self.__sub_bucket_bits = sub_buckets.bit_length() - 1
+        self.__counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __index(self, value):
+        if value < self.__sub_buckets:
+            return value
+        shift = value.bit_length() - self.__sub_bucket_bits - 1
+        return (shift + 1) * self.__sub_buckets + (value >> shift) - self.__sub_buckets
+
+    def __highest_value(self, index):
+        if index < self.__sub_buckets:
+            return index
+        shift = index // self.__sub_buckets - 1
+        return (((index % self.__sub_buckets) + self.__sub_buckets + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self.__index(value)
+        if index >= len(self.__counts):
+            self.__counts.extend([ 0 ] * (index + 1 - len(self.__counts)))
+        self.__counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile: float):
+        """Highest value of the bucket holding the given percentile (0-100)."""
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.__counts):
+            seen += count
+            if seen >= target:
+                return min(self.__highest_value(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other):
+        if len(other.__counts) > len(self.__counts):
+            self.__counts.extend([ 0 ] * (len(other.__counts) - len(self.__counts)))
+        for index, count in enumerate(other.__counts):
+            self.__counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+_PHASES = ('serialize', 'wait', 'deserialize', 'total')
+_PERCENTILES = ((50, 'p50'), (99, 'p99'), (99.9, 'p999'))
+
+class _NullCall:
+    """Call timer used when metrics are turned off."""
+    __slots__ = ()
+
+    def serialized(self, request):
+        pass
+
+    def received(self):
+        pass
+
+    def retried(self):
+        pass
+
+    def failed(self):
+        pass
+
+    def deserialized(self, tensor):
+        pass
+
+    def finished(self, tensor):
+        pass
+
+NULL_CALL = _NullCall()
+
+class CallTimer:
+    """Times the phases of a single call and reports them to ClientMetrics."""
+    __slots__ = ('_metrics', '_start', '_last', '_phases', '_retries', '_request_bytes')
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._start = self._last = time.perf_counter()
+        self._phases = {}
+        self._retries = 0
+        self._request_bytes = 0
+
+    def __mark(self, phase):
+        now = time.perf_counter()
+        self._phases[phase] = now - self._last
+        self._last = now
+
+    def serialized(self, request):
+        self.__mark('serialize')
+        self._request_bytes = request.ByteSize()
+
+    def received(self):
+        self.__mark('wait')
+
+    def retried(self):
+        self._retries += 1
+
+    def failed(self):
+        self._metrics._record_failure(self._retries)
+
+    def deserialized(self, tensor):
+        self.__mark('deserialize')
+        self.finished(tensor)
+
+    def finished(self, tensor):
+        self._phases['total'] = time.perf_counter() - self._start
+        self._metrics._record_call(self._phases, self._retries, self._request_bytes, tensor.ByteSize())
+
+class ClientMetrics:
+    """Aggregated timings and counters of the calls made by a client.
+
+    Latencies are kept in microseconds and reported in milliseconds by as_dict
+    and in seconds by to_prometheus.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.__latencies = { phase: LatencyHistogram() for phase in _PHASES }
+            self.__request_sizes = LatencyHistogram()
+            self.__counters = { 'calls': 0, 'failures': 0, 'retries': 0, 'channel_reinitializations': 0,
+                                'request_bytes': 0, 'response_bytes': 0 }
+            self.__started = time.monotonic()
+
+    def start_call(self):
+        return CallTimer(self)
+
+    def record_channel_reinitialization(self):
+        with self.__lock:
+            self.__counters['channel_reinitializations'] += 1
+
+    def _record_call(self, phases, retries, request_bytes, response_bytes):
+        with self.__lock:
+            for phase, seconds in phases.items():
+                self.__latencies[phase].record(seconds * 1e6)
+            self.__request_sizes.record(request_bytes)
+            counters = self.__counters
+            counters['calls'] += 1
+            counters['retries'] += retries
+            counters['request_bytes'] += request_bytes
+            counters['response_bytes'] += response_bytes
+
+    def _record_failure(self, retries):
+        with self.__lock:
+            self.__counters['failures'] += 1
+            self.__counters['retries'] += retries
+
+    def as_dict(self):
+        with self.__lock:
+            elapsed = time.monotonic() - self.__started
+            result = dict(self.__counters)
+            result['calls_per_second'] = result['calls'] / elapsed if elapsed > 0 else 0.0
+            result['latency_ms'] = {}
+            for phase, histogram in self.__latencies.items():
+                if histogram.count == 0:
+                    continue
+                summary = { 'count': histogram.count, 'mean': histogram.mean() / 1000.0, 'max': histogram.max / 1000.0 }
+                for percentile, name in _PERCENTILES:
+                    summary[name] = histogram.percentile(percentile) / 1000.0
+                result['latency_ms'][phase] = summary
+            result['request_size_bytes'] = { name: self.__request_sizes.percentile(percentile) for percentile, name in _PERCENTILES }
+            return result
+
+    def to_prometheus(self, prefix: str = 'amlrealtimeai_client'):
+        """Returns the metrics in the Prometheus text exposition format."""
+        with self.__lock:
+            lines = [ '# TYPE {0}_latency_seconds summary'.format(prefix) ]
+            for phase, histogram in self.__latencies.items():
+                for percentile, _ in _PERCENTILES:
+                    lines.append('{0}_latency_seconds{{phase="{1}",quantile="{2}"}} {3}'.format(
+                        prefix, phase, percentile / 100.0, histogram.percentile(percentile) / 1e6))
+                lines.append('{0}_latency_seconds_sum{{phase="{1}"}} {2}'.format(prefix, phase, histogram.total / 1e6))
+                lines.append('{0}_latency_seconds_count{{phase="{1}"}} {2}'.format(prefix, phase, histogram.count))
+            for name, value in self.__counters.items():
+                lines.append('# TYPE {0}_{1}_total counter'.format(prefix, name))
+                lines.append('{0}_{1}_total {2}'.format(prefix, name, value))
+            return '\n'.join(lines) + '\n'
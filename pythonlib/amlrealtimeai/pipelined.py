@@ -0,0 +1,121 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Pipelined prediction client.
+
+PredictionService only has a unary Predict method, so rather than a stream,
+many Predict calls are multiplexed over one HTTP/2 channel with
+Predict.future. The channel is opened when the client is created and never
+closed for being idle, so calls do not pay for TCP, TLS and HTTP/2 setup
+again after a quiet period.
+"""
+import collections
+import grpc
+import time
+
+from .cache import ResultCache
+from .client import PredictionClient
+from .metrics import ClientMetrics
+from .preprocessing import ImagePreprocessor
+from .retry import RetryPolicy
+
+CHANNEL_OPTIONS = [
+    ('grpc.max_receive_message_length', -1),
+    ('grpc.max_send_message_length', -1),
+]
+
+class PipelinedPredictionClient(PredictionClient):
+    """PredictionClient that keeps up to max_in_flight calls on one warm channel.
+
+    score_numpy_arrays, score_numpy_batches and score_images issue their
+    calls with Predict.future from the calling thread instead of a thread
+    pool and return the results in input order. A call that fails is resent
+    with the retry policy once its turn comes, the failed future counting as
+    its first attempt. With connect_timeout the
+    client waits up to that many seconds for the connection at construction;
+    if the service is not reachable yet the first call connects instead.
+
+    keepalive_time_ms is the interval of keepalive pings. gRPC servers,
+    TF Serving included, by default answer pings more frequent than every
+    five minutes, or pings sent while no call is active, with a too_many_pings
+    GOAWAY, which drops the connection. The defaults stay within those limits;
+    only lower them or set keepalive_without_calls for servers configured to
+    allow it.
+    """
+
+    def __init__(self, address: str, port: int, use_ssl:bool = False, access_token:str = "", max_in_flight: int = 64,
+                 connect_timeout: float = 5.0, metrics:ClientMetrics = None, cache:ResultCache = None,
+                 retry_policy:RetryPolicy = None, preprocessor:ImagePreprocessor = None,
+                 keepalive_time_ms: int = 300000, keepalive_without_calls: bool = False):
+        if(max_in_flight is None or max_in_flight < 1):
+            raise ValueError("max_in_flight")
+
+        if(keepalive_time_ms is None or keepalive_time_ms < 1):
+            raise ValueError("keepalive_time_ms")
+
+        super().__init__(address, port, use_ssl, access_token, channel_shutdown_timeout=None, metrics=metrics,
+                         cache=cache, retry_policy=retry_policy, preprocessor=preprocessor)
+        options = CHANNEL_OPTIONS + [
+            ('grpc.keepalive_time_ms', keepalive_time_ms),
+            ('grpc.keepalive_timeout_ms', 20000),
+            ('grpc.keepalive_permit_without_calls', 1 if keepalive_without_calls else 0),
+        ]
+        self._channel_func = self._make_channel_func("{0}:{1}".format(address, port), use_ssl, options)
+        self._max_in_flight = max_in_flight
+        if connect_timeout is not None:
+            try:
+                self.connect(connect_timeout)
+            except grpc.FutureTimeoutError:
+                pass
+
+    def _predict_many(self, requests, timeout, max_in_flight: int = None):
+        if max_in_flight is None:
+            max_in_flight = self._max_in_flight
+        if(max_in_flight < 1):
+            raise ValueError("max_in_flight")
+
+        pending = collections.deque()
+        requests = iter(requests)
+        try:
+            while True:
+                if len(pending) >= max_in_flight:
+                    yield self.__result(timeout, *pending.popleft())
+                call = self._start_call()
+                request = next(requests, None)
+                if request is None:
+                    break
+                call.serialized(request)
+                deadline = self._retry_policy.start()
+                generation = self._channel_generation
+                future = self._get_grpc_stub().Predict.future(
+                    request, self._retry_policy.attempt_timeout(timeout, deadline))
+                pending.append((request, call, deadline, generation, future))
+            while pending:
+                yield self.__result(timeout, *pending.popleft())
+        finally:
+            # the caller stopped early or a call failed, nothing waits for the rest
+            for _, _, _, _, future in pending:
+                future.cancel()
+
+    def __result(self, timeout, request, call, deadline, generation, future):
+        try:
+            result = future.result()
+        except grpc.RpcError as rpcError:
+            policy = self._retry_policy
+            if self._channel_generation != generation:
+                # a retry rebuilt the channel while the call was in flight, it is resent at once
+                if(policy.max_attempts <= 1):
+                    call.failed()
+                    raise
+            else:
+                sleep_delay = policy.next_backoff(rpcError, 1, deadline)
+                if(sleep_delay is None):
+                    call.failed()
+                    raise
+                time.sleep(sleep_delay)
+            call.retried()
+            result = self._call('Predict', request, timeout, call, attempt=1, deadline=deadline)
+        else:
+            call.received()
+        output = result.outputs["output_alias"]
+        call.finished(output)
+        return output
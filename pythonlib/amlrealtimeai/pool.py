@@ -0,0 +1,225 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+import grpc
+import itertools
+import threading
+import time
+from datetime import timedelta
+
+from .client import PredictionClient
+from .cache import ResultCache
+from .metrics import ClientMetrics, NULL_CALL
+from .retry import RetryPolicy
+
+from . import protos
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+class _Endpoint:
+
+    def __init__(self, host: str, channel_func, channels_per_endpoint: int):
+        self.host = host
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = None
+        self.stale = False
+        self._channel_func = channel_func
+        self._channels = [ None ] * channels_per_endpoint
+        self._stubs = [ None ] * channels_per_endpoint
+        self._next_channel = itertools.cycle(range(channels_per_endpoint))
+        for i in range(channels_per_endpoint):
+            self._open_channel(i)
+
+    def _open_channel(self, i):
+        self._channels[i] = self._channel_func()
+        self._stubs[i] = protos.prediction_service_pb2_grpc.PredictionServiceStub(self._channels[i])
+
+    def get_stub(self):
+        return self._stubs[next(self._next_channel)]
+
+    def ready_futures(self):
+        return [ grpc.channel_ready_future(channel) for channel in self._channels ]
+
+    def reinitialize_channels(self):
+        for i, channel in enumerate(self._channels):
+            channel.close()
+            self._open_channel(i)
+        self.stale = False
+
+    def close(self):
+        for channel in self._channels:
+            channel.close()
+
+class PooledPredictionClient(PredictionClient):
+    """PredictionClient that spreads requests over several deployments.
+
+    Every endpoint keeps channels_per_endpoint channels open for the lifetime
+    of the client. Requests go to the endpoints in turn (round_robin) or to the
+    endpoint with the fewest requests in flight (least_outstanding). An
+    endpoint that fails a request is ejected for ejection_duration and the
+    request is retried on another endpoint right away. When every endpoint is
+    ejected the one that comes back first is used anyway.
+
+    retry_policy decides which status codes are retried and supplies the
+    deadline and retry budget; max_attempts bounds the number of endpoints a
+    single request is tried on. Failing over does not wait for a backoff.
+    get_model_signature asks the endpoints the same way.
+    """
+
+    def __init__(self, endpoints: list, use_ssl:bool = False, access_token:str = "", strategy:str = ROUND_ROBIN,
+                 ejection_duration:timedelta = timedelta(seconds=30), channels_per_endpoint:int = 1, max_attempts:int = None,
+                 metrics:ClientMetrics = None, cache:ResultCache = None, retry_policy:RetryPolicy = None):
+        if(endpoints is None or len(endpoints) == 0):
+            raise ValueError("endpoints")
+
+        if(strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING)):
+            raise ValueError("strategy")
+
+        if(channels_per_endpoint is None or channels_per_endpoint < 1):
+            raise ValueError("channels_per_endpoint")
+
+        hosts = [ self._parse_endpoint(endpoint) for endpoint in endpoints ]
+        super().__init__(hosts[0][0], hosts[0][1], use_ssl, access_token, metrics=metrics, cache=cache, retry_policy=retry_policy)
+
+        self.__strategy = strategy
+        self.__ejection_duration = ejection_duration
+        self.__max_attempts = max_attempts if max_attempts is not None else len(hosts) + 1
+        self.__lock = threading.Lock()
+        self.__round_robin = itertools.count()
+        self.__endpoints = []
+        for address, port in hosts:
+            host = "{0}:{1}".format(address, port)
+            self.__endpoints.append(_Endpoint(host, self._make_channel_func(host, use_ssl), channels_per_endpoint))
+        # the endpoints serve the same model, any of them may have computed a cached result
+        self._cache_scope = ",".join(sorted(endpoint.host for endpoint in self.__endpoints))
+
+    @staticmethod
+    def _parse_endpoint(endpoint):
+        if isinstance(endpoint, str):
+            address, _, port = endpoint.rpartition(':')
+            if(not address or not port.isdigit()):
+                raise ValueError("endpoint {0} is not in the form address:port".format(endpoint))
+            return address, int(port)
+        address, port = endpoint
+        if(address is None or port is None):
+            raise ValueError("endpoints")
+        return address, port
+
+    @property
+    def endpoint_stats(self):
+        """Requests, failures, requests in flight and health of every endpoint."""
+        now = self._get_datetime_now()
+        with self.__lock:
+            return [ { 'endpoint': endpoint.host,
+                       'requests': endpoint.requests,
+                       'failures': endpoint.failures,
+                       'outstanding': endpoint.outstanding,
+                       'healthy': self.__is_healthy(endpoint, now) }
+                     for endpoint in self.__endpoints ]
+
+    def close(self):
+        for endpoint in self.__endpoints:
+            endpoint.close()
+        # the channel of the base client, if anything opened it, and the cached signatures
+        super().close()
+
+    def connect(self, timeout: float = 10.0):
+        """Connects the channels of every endpoint now rather than on the first call.
+
+        Endpoints whose channels are not all ready within timeout seconds are
+        ejected. Raises grpc.FutureTimeoutError if no endpoint is ready.
+        """
+        futures = [ (endpoint, endpoint.ready_futures()) for endpoint in self.__endpoints ]
+        deadline = time.monotonic() + timeout
+        ready = 0
+        for endpoint, endpoint_futures in futures:
+            try:
+                # the channels connect at the same time, so the timeout is shared
+                for future in endpoint_futures:
+                    future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except grpc.FutureTimeoutError:
+                with self.__lock:
+                    endpoint.ejected_until = self._get_datetime_now() + self.__ejection_duration
+            else:
+                ready += 1
+            finally:
+                for future in endpoint_futures:
+                    future.cancel()
+        if ready == 0:
+            raise grpc.FutureTimeoutError()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def __is_healthy(endpoint, now):
+        return endpoint.ejected_until is None or endpoint.ejected_until <= now
+
+    def __acquire(self, tried):
+        now = self._get_datetime_now()
+        with self.__lock:
+            candidates = [ e for e in self.__endpoints if e not in tried and self.__is_healthy(e, now) ]
+            if not candidates:
+                candidates = [ e for e in self.__endpoints if e not in tried ] or self.__endpoints
+                # nothing healthy is left, fail open on whichever comes back first
+                candidates = [ min(candidates, key=lambda e: e.ejected_until or now) ]
+
+            start = next(self.__round_robin)
+            ordered = [ candidates[(start + i) % len(candidates)] for i in range(len(candidates)) ]
+            if self.__strategy == LEAST_OUTSTANDING:
+                endpoint = min(ordered, key=lambda e: e.outstanding)
+            else:
+                endpoint = ordered[0]
+
+            if endpoint.stale and endpoint.outstanding == 0:
+                # rebuilt only once nothing else is using the failed channels
+                endpoint.reinitialize_channels()
+                if self.metrics is not None:
+                    self.metrics.record_channel_reinitialization()
+
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def __release(self, endpoint, failed: bool, reconnect: bool = False):
+        with self.__lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.stale = endpoint.stale or reconnect
+                endpoint.ejected_until = self._get_datetime_now() + self.__ejection_duration
+            else:
+                endpoint.ejected_until = None
+
+    def _call(self, method: str, request, timeout, call=NULL_CALL, attempt: int = 0, deadline=None):
+        # Predict and GetModelMetadata both go to the endpoints and fail over between them
+        policy = self._retry_policy
+        if attempt == 0:
+            deadline = policy.start()
+        attempts = self.__max_attempts - attempt
+        tried = []
+
+        while(True):
+            endpoint = self.__acquire(tried)
+            try:
+                result = getattr(endpoint.get_stub(), method)(request, policy.attempt_timeout(timeout, deadline))
+            except grpc.RpcError as rpcError:
+                # a non-retryable error such as INVALID_ARGUMENT says nothing about the endpoint's health
+                retryable = policy.is_retryable(rpcError)
+                self.__release(endpoint, retryable, policy.is_connectivity_error(rpcError))
+                attempts = attempts - 1
+                if(not retryable or attempts <= 0 or not policy.allow_retry(deadline)):
+                    call.failed()
+                    raise
+                call.retried()
+                print("Retrying", endpoint.host, rpcError)
+                tried.append(endpoint)
+                continue
+            self.__release(endpoint, False)
+            call.received()
+            return result
@@ -0,0 +1,112 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Client-side image preprocessing.
+
+Camera images are often several megabytes while the models only look at e.g.
+224x224 pixels. An ImagePreprocessor decodes an image, resizes and
+center-crops it to the model's input size and either re-encodes it as a small
+JPEG, which services taking encoded images accept unchanged, or converts it to
+a uint8 or float32 HWC tensor for services taking arrays.
+
+Pillow is only needed when a preprocessor is created (pip install pillow).
+
+PredictionClient.score_images preprocesses in spawned worker processes, which
+import the main module again: scripts using it need an
+if __name__ == '__main__': guard around the code that scores.
+"""
+import io
+import numpy as np
+
+OUTPUTS = ('jpeg', 'uint8', 'float32')
+
+def _load_pillow():
+    # imported on first use, Pillow adds noticeably to the import time of the client
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("ImagePreprocessor requires Pillow, install it with pip install pillow")
+    return Image
+
+class ImagePreprocessor:
+    """Turns encoded image bytes into what is sent to the service.
+
+    The shorter side is resized to resize pixels (size * 256 / 224 by default,
+    as in the ResNet evaluation protocol) and the center size x size pixels are
+    kept; with crop=False the image is resized to size x size directly. For
+    float32 output, values are scaled to [0, 1] and then normalized with mean
+    and std per channel if they are given.
+
+    Instances hold no state besides their settings, so they can be pickled to
+    worker processes.
+    """
+
+    def __init__(self, size: int = 224, resize: int = None, crop: bool = True, output: str = 'jpeg',
+                 quality: int = 90, mean = None, std = None):
+        _load_pillow()
+
+        if(size is None or size < 1):
+            raise ValueError("size")
+
+        if(output not in OUTPUTS):
+            raise ValueError("output")
+
+        self.size = size
+        self.resize = resize if resize is not None else int(round(size * 256 / 224.0))
+        if(self.resize < size):
+            raise ValueError("resize")
+        self.crop = crop
+        self.output = output
+        self.quality = quality
+        self.mean = None if mean is None else tuple(float(x) for x in mean)
+        self.std = None if std is None else tuple(float(x) for x in std)
+
+    def __repr__(self):
+        # also used in cache keys, so it must identify every setting
+        return "ImagePreprocessor(size={0}, resize={1}, crop={2}, output={3!r}, quality={4}, mean={5}, std={6})".format(
+            self.size, self.resize, self.crop, self.output, self.quality, self.mean, self.std)
+
+    @property
+    def datatype(self):
+        """The tensor type of the processed image as a numpy dtype, None for encoded bytes."""
+        if self.output == 'jpeg':
+            return None
+        return np.dtype(self.output)
+
+    def __call__(self, data: bytes):
+        """Returns JPEG bytes or an array of shape [size, size, 3]."""
+        Image = _load_pillow()
+        image = Image.open(io.BytesIO(data))
+        target = self.resize if self.crop else self.size
+        # lets the JPEG decoder downscale by up to 8x while decoding, much cheaper than a full decode
+        image.draft('RGB', (target, target))
+        image = image.convert('RGB')
+
+        if self.crop:
+            width, height = image.size
+            scale = self.resize / float(min(width, height))
+            width, height = max(self.size, int(round(width * scale))), max(self.size, int(round(height * scale)))
+            image = image.resize((width, height), Image.BILINEAR)
+            left, top = (width - self.size) // 2, (height - self.size) // 2
+            image = image.crop((left, top, left + self.size, top + self.size))
+        else:
+            image = image.resize((self.size, self.size), Image.BILINEAR)
+
+        if self.output == 'jpeg':
+            encoded = io.BytesIO()
+            image.save(encoded, format='JPEG', quality=self.quality)
+            return encoded.getvalue()
+
+        array = np.asarray(image, dtype=np.uint8)
+        if self.output == 'uint8':
+            return array
+        array = array.astype(np.float32) / 255.0
+        if self.mean is not None:
+            array -= np.asarray(self.mean, dtype=np.float32)
+        if self.std is not None:
+            array /= np.asarray(self.std, dtype=np.float32)
+        return array
+
+def preprocess_file(preprocessor: ImagePreprocessor, path: str):
+    """Reads and preprocesses an image; module level so that process pools can pickle it."""
+    with open(path, 'rb') as f:
+        return preprocessor(f.read())
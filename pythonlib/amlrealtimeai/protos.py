@@ -0,0 +1,43 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Protocol buffer and gRPC modules used by the clients.
+
+The copies vendored under external are used unless TensorFlow has been
+imported already and TensorFlow Serving is installed. Importing TensorFlow
+only for its protos takes seconds, and the two copies register the same .proto
+files with protobuf so they cannot be mixed in one process; for the same
+reason the vendored modules only import each other.
+
+The modules needed to build a request are imported with this module. The
+service stub and the model metadata messages pull in most of the
+TensorFlow Serving API, so they are imported on first access, e.g.
+protos.prediction_service_pb2_grpc.
+"""
+import importlib
+import importlib.util
+import sys
+
+_USE_TENSORFLOW = 'tensorflow' in sys.modules and importlib.util.find_spec('tensorflow_serving') is not None
+
+_LAZY_MODULES = {
+    'prediction_service_pb2_grpc': 'tensorflow_serving.apis',
+    'get_model_metadata_pb2': 'tensorflow_serving.apis',
+}
+
+def _import(package, name):
+    if _USE_TENSORFLOW:
+        return importlib.import_module('{0}.{1}'.format(package, name))
+    return importlib.import_module('.external.{0}.{1}'.format(package, name), __package__)
+
+tensor_pb2 = _import('tensorflow.core.framework', 'tensor_pb2')
+tensor_shape_pb2 = _import('tensorflow.core.framework', 'tensor_shape_pb2')
+types_pb2 = _import('tensorflow.core.framework', 'types_pb2')
+predict_pb2 = _import('tensorflow_serving.apis', 'predict_pb2')
+
+def __getattr__(name):
+    package = _LAZY_MODULES.get(name)
+    if package is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    module = _import(package, name)
+    globals()[name] = module
+    return module
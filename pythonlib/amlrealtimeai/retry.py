@@ -0,0 +1,146 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Retry policy for the prediction clients.
+
+A RetryPolicy decides whether a failed call is retried and how long to wait
+first: only retryable status codes are retried, backoff grows exponentially
+with random jitter, an optional deadline bounds the whole call including
+retries, and an optional RetryBudget shared by every call of a client stops
+retry storms when an endpoint browns out.
+"""
+import grpc
+import random
+import threading
+import time
+
+DEFAULT_RETRYABLE_STATUS_CODES = frozenset([
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+])
+
+def _status_code(error):
+    code = getattr(error, 'code', None)
+    return code() if callable(code) else None
+
+class RetryBudget:
+    """Token bucket shared by the calls of a client.
+
+    Every retry takes a token. Tokens come back at refill_per_second up to
+    max_tokens, so a burst of failures can only cause a bounded number of
+    retries instead of multiplying the load on the service.
+    """
+
+    def __init__(self, max_tokens: float = 10.0, refill_per_second: float = 1.0):
+        if(max_tokens is None or max_tokens < 1):
+            raise ValueError("max_tokens")
+
+        if(refill_per_second is None or refill_per_second < 0):
+            raise ValueError("refill_per_second")
+
+        self.__max_tokens = float(max_tokens)
+        self.__refill_per_second = float(refill_per_second)
+        self.__tokens = float(max_tokens)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        with self.__lock:
+            self.__refill()
+            return self.__tokens
+
+    def __refill(self):
+        now = time.monotonic()
+        self.__tokens = min(self.__max_tokens, self.__tokens + (now - self.__updated) * self.__refill_per_second)
+        self.__updated = now
+
+    def try_spend(self):
+        with self.__lock:
+            self.__refill()
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+class RetryPolicy:
+    """When and how often a failed Predict call is retried.
+
+    max_attempts counts the first call. Backoff before retry n is
+    initial_backoff * backoff_multiplier ** (n - 1), capped at max_backoff and
+    scaled by a random factor in [1 - jitter, 1 + jitter]. deadline, in
+    seconds, bounds the whole call including retries and backoff.
+    """
+
+    def __init__(self, max_attempts: int = 5, initial_backoff: float = 1.0, max_backoff: float = 30.0,
+                 backoff_multiplier: float = 2.0, jitter: float = 0.2,
+                 retryable_status_codes = DEFAULT_RETRYABLE_STATUS_CODES, deadline: float = None,
+                 budget: RetryBudget = None):
+        if(max_attempts is None or max_attempts < 1):
+            raise ValueError("max_attempts")
+
+        if(jitter < 0 or jitter > 1):
+            raise ValueError("jitter")
+
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff_multiplier = backoff_multiplier
+        self.jitter = jitter
+        self.retryable_status_codes = frozenset(retryable_status_codes)
+        self.deadline = deadline
+        self.budget = budget
+        self.__random = random.Random()
+
+    def is_retryable(self, error):
+        code = _status_code(error)
+        # errors without a status code come from the transport, retry them like UNAVAILABLE
+        return code is None or code in self.retryable_status_codes
+
+    @staticmethod
+    def is_connectivity_error(error):
+        """Whether the channel should be rebuilt before the next attempt."""
+        code = _status_code(error)
+        return code is None or code == grpc.StatusCode.UNAVAILABLE
+
+    @staticmethod
+    def is_cancelled(error):
+        return _status_code(error) == grpc.StatusCode.CANCELLED
+
+    def start(self):
+        """Returns the monotonic time the call must finish by, or None."""
+        if self.deadline is None:
+            return None
+        return time.monotonic() + self.deadline
+
+    def attempt_timeout(self, timeout: float, deadline):
+        """Timeout for the next attempt, 0 once the deadline has passed."""
+        if deadline is None:
+            return timeout
+        return max(0.0, min(timeout, deadline - time.monotonic()))
+
+    def backoff(self, attempt: int):
+        delay = min(self.max_backoff, self.initial_backoff * self.backoff_multiplier ** (attempt - 1))
+        if self.jitter:
+            delay *= self.__random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def next_backoff(self, error, attempt: int, deadline=None):
+        """Seconds to wait before retrying after attempt failed with error, or None to give up."""
+        if attempt >= self.max_attempts or not self.is_retryable(error):
+            return None
+        delay = self.backoff(attempt)
+        if not self.allow_retry(deadline, delay):
+            return None
+        return delay
+
+    def allow_retry(self, deadline=None, delay: float = 0.0):
+        """Whether a retry after delay seconds still fits the deadline and the budget."""
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return False
+        if self.budget is not None and not self.budget.try_spend():
+            return False
+        return True
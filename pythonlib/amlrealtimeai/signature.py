@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Model signatures reported by PredictionService.GetModelMetadata.
+
+A ModelSignature names the inputs and outputs of a model with their types
+and shapes, so requests can be built without hard-coding tensor names and
+checked before they are sent: a malformed request then fails at once with a
+ValueError instead of after a round trip, and is never retried.
+"""
+import numpy as np
+
+from .protos import types_pb2
+from .tensor_codec import to_numpy_dtype
+
+class TensorSpec:
+    """Type and shape of one input or output.
+
+    shape is None when the rank is unknown, and -1 marks a dimension of any
+    size, e.g. the batch dimension.
+    """
+
+    def __init__(self, name: str, datatype, shape: list = None):
+        self.name = name
+        self.datatype = datatype
+        self.shape = None if shape is None else list(shape)
+
+    @staticmethod
+    def from_tensor_info(tensor_info):
+        shape = tensor_info.tensor_shape
+        dims = None if shape.unknown_rank else [ dim.size for dim in shape.dim ]
+        return TensorSpec(tensor_info.name, tensor_info.dtype, dims)
+
+    def __repr__(self):
+        return "TensorSpec({0!r}, {1}, {2})".format(self.name, types_pb2.DataType.Name(self.datatype), self.shape)
+
+    @staticmethod
+    def __fits(values, dtype):
+        if np.can_cast(values.dtype, dtype, casting='safe'):
+            return True
+        # float64 is what NumPy and Python floats default to, float32 what models take
+        if values.dtype == np.float64 and dtype == np.float32:
+            return True
+        # integers, e.g. Python ints, are accepted by any numeric type that holds their values exactly
+        if values.dtype.kind not in ('b', 'i', 'u') or dtype.kind not in ('i', 'u', 'f'):
+            return False
+        # values that do not fit overflow on the way, which is what the comparison detects
+        with np.errstate(over='ignore', invalid='ignore'):
+            return np.array_equal(values.astype(dtype), values)
+
+    def check(self, alias: str, values):
+        """Returns values as an array of this tensor's type, raises ValueError if they do not fit.
+
+        Values must convert without loss, except float64 to float32.
+        """
+        if self.datatype == types_pb2.DT_STRING:
+            values = np.asarray(values, dtype=object)
+        else:
+            values = np.asarray(values)
+            if(values.dtype.kind in ('O', 'S', 'U') or not self.__fits(values, to_numpy_dtype(self.datatype))):
+                raise ValueError("input '{0}' takes {1}, got {2}".format(
+                    alias, types_pb2.DataType.Name(self.datatype), values.dtype))
+
+        if self.shape is not None:
+            if(len(values.shape) != len(self.shape) or
+               any(expected not in (-1, actual) for expected, actual in zip(self.shape, values.shape))):
+                raise ValueError("input '{0}' takes shape {1}, got {2}".format(alias, self.shape, list(values.shape)))
+        return values
+
+class ModelSignature:
+    """Inputs and outputs of one signature of a model, keyed by their aliases."""
+
+    def __init__(self, name: str, inputs: dict, outputs: dict, method_name: str = ""):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.method_name = method_name
+
+    @staticmethod
+    def from_signature_def(name: str, signature_def):
+        return ModelSignature(name,
+                              { alias: TensorSpec.from_tensor_info(info) for alias, info in signature_def.inputs.items() },
+                              { alias: TensorSpec.from_tensor_info(info) for alias, info in signature_def.outputs.items() },
+                              signature_def.method_name)
+
+    @staticmethod
+    def from_metadata_response(response, signature_name: str = None):
+        """Picks signature_name from a GetModelMetadataResponse.
+
+        Without a name, serving_default is used, or the only signature if the
+        model has just one.
+        """
+        from .protos import get_model_metadata_pb2
+
+        signatures = get_model_metadata_pb2.SignatureDefMap()
+        if(not response.metadata['signature_def'].Unpack(signatures)):
+            raise ValueError("the model metadata has no signature_def")
+
+        signature_defs = signatures.signature_def
+        if signature_name is None:
+            if 'serving_default' in signature_defs or len(signature_defs) != 1:
+                signature_name = 'serving_default'
+            else:
+                signature_name = next(iter(signature_defs))
+        if signature_name not in signature_defs:
+            raise ValueError("the model has no signature '{0}', it has {1}".format(signature_name, sorted(signature_defs)))
+        return ModelSignature.from_signature_def(signature_name, signature_defs[signature_name])
+
+    def __repr__(self):
+        return "ModelSignature({0!r}, inputs={1}, outputs={2})".format(self.name, self.inputs, self.outputs)
+
+    def check_inputs(self, inputs: dict):
+        """Returns the inputs as arrays, raises ValueError unless they are what the model takes."""
+        unknown = sorted(set(inputs) - set(self.inputs))
+        if unknown:
+            raise ValueError("the model has no inputs {0}, it takes {1}".format(unknown, sorted(self.inputs)))
+        missing = sorted(set(self.inputs) - set(inputs))
+        if missing:
+            raise ValueError("missing inputs {0}".format(missing))
+        return { alias: self.inputs[alias].check(alias, values) for alias, values in inputs.items() }
+
+    def check_outputs(self, outputs):
+        unknown = sorted(set(outputs) - set(self.outputs))
+        if unknown:
+            raise ValueError("the model has no outputs {0}, it has {1}".format(unknown, sorted(self.outputs)))
@@ -0,0 +1,147 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Conversion between NumPy arrays and TensorProto messages.
+
+Drop-in replacement for tf.contrib.util.make_tensor_proto and make_ndarray that
+only needs numpy and protobuf. Numeric tensors are written to and read from
+tensor_content in one piece instead of element by element.
+"""
+import numpy as np
+
+from .protos import tensor_pb2, types_pb2
+
+# tensor_content is always little endian
+_DT_TO_NP = {
+    types_pb2.DT_FLOAT: np.dtype('<f4'),
+    types_pb2.DT_DOUBLE: np.dtype('<f8'),
+    types_pb2.DT_HALF: np.dtype('<f2'),
+    types_pb2.DT_INT8: np.dtype('i1'),
+    types_pb2.DT_INT16: np.dtype('<i2'),
+    types_pb2.DT_INT32: np.dtype('<i4'),
+    types_pb2.DT_INT64: np.dtype('<i8'),
+    types_pb2.DT_UINT8: np.dtype('u1'),
+    types_pb2.DT_UINT16: np.dtype('<u2'),
+    types_pb2.DT_UINT32: np.dtype('<u4'),
+    types_pb2.DT_UINT64: np.dtype('<u8'),
+    types_pb2.DT_BOOL: np.dtype('?'),
+    types_pb2.DT_COMPLEX64: np.dtype('<c8'),
+    types_pb2.DT_COMPLEX128: np.dtype('<c16'),
+}
+
+_NP_TO_DT = { np_dtype.newbyteorder('='): dt for dt, np_dtype in _DT_TO_NP.items() }
+
+# repeated fields used when a tensor is sent without tensor_content
+_DT_TO_VAL_FIELD = {
+    types_pb2.DT_FLOAT: 'float_val',
+    types_pb2.DT_DOUBLE: 'double_val',
+    types_pb2.DT_HALF: 'half_val',
+    types_pb2.DT_INT8: 'int_val',
+    types_pb2.DT_INT16: 'int_val',
+    types_pb2.DT_INT32: 'int_val',
+    types_pb2.DT_INT64: 'int64_val',
+    types_pb2.DT_UINT8: 'int_val',
+    types_pb2.DT_UINT16: 'int_val',
+    types_pb2.DT_UINT32: 'uint32_val',
+    types_pb2.DT_UINT64: 'uint64_val',
+    types_pb2.DT_BOOL: 'bool_val',
+    types_pb2.DT_COMPLEX64: 'scomplex_val',
+    types_pb2.DT_COMPLEX128: 'dcomplex_val',
+}
+
+def to_numpy_dtype(datatype):
+    """Returns the NumPy dtype used on the wire for a types_pb2 DataType."""
+    if datatype == types_pb2.DT_STRING:
+        return np.dtype(object)
+    try:
+        return _DT_TO_NP[datatype]
+    except KeyError:
+        raise ValueError("unsupported tensor dtype {0}".format(datatype))
+
+def to_datatype(np_dtype):
+    """Returns the types_pb2 DataType matching a NumPy dtype."""
+    np_dtype = np.dtype(np_dtype)
+    if np_dtype.kind in ('O', 'S', 'U'):
+        return types_pb2.DT_STRING
+    try:
+        return _NP_TO_DT[np_dtype.newbyteorder('=')]
+    except KeyError:
+        raise ValueError("unsupported numpy dtype {0}".format(np_dtype))
+
+def fill_tensor_proto(tensor, values, datatype=None):
+    """Writes values into an existing TensorProto, e.g. request.inputs['images'].
+
+    Filling the message in place avoids building a separate TensorProto and
+    copying it into the request.
+    """
+    if datatype is None:
+        values = np.asarray(values)
+        datatype = to_datatype(values.dtype)
+
+    tensor.Clear()
+    tensor.dtype = datatype
+
+    if datatype == types_pb2.DT_STRING:
+        values = np.asarray(values, dtype=object)
+        for size in values.shape:
+            tensor.tensor_shape.dim.add().size = size
+        tensor.string_val.extend(v.encode('utf-8') if isinstance(v, str) else bytes(v) for v in values.flat)
+        return tensor
+
+    # not np.ascontiguousarray, which turns a scalar into shape [1]
+    values = np.asarray(values, dtype=to_numpy_dtype(datatype), order='C')
+    for size in values.shape:
+        tensor.tensor_shape.dim.add().size = size
+    tensor.tensor_content = values.tobytes()
+    return tensor
+
+def make_tensor_proto(values, datatype=None):
+    """Returns a new TensorProto holding values, cast to datatype if given."""
+    return fill_tensor_proto(tensor_pb2.TensorProto(), values, datatype)
+
+def make_ndarray(tensor):
+    """Returns the contents of a TensorProto as a NumPy array.
+
+    Arrays decoded from tensor_content share memory with the message and are
+    read-only; call writable() on the result to modify it.
+    """
+    shape = [ dim.size for dim in tensor.tensor_shape.dim ]
+    datatype = tensor.dtype
+
+    if datatype == types_pb2.DT_STRING:
+        values = np.empty(len(tensor.string_val), dtype=object)
+        values[:] = list(tensor.string_val)
+        return _broadcast(values, shape)
+
+    np_dtype = to_numpy_dtype(datatype)
+    if tensor.tensor_content:
+        return np.frombuffer(tensor.tensor_content, dtype=np_dtype).reshape(shape)
+
+    field = getattr(tensor, _DT_TO_VAL_FIELD[datatype])
+    if datatype == types_pb2.DT_HALF:
+        # half_val holds the raw 16 bit patterns widened to int32
+        values = np.asarray(field, dtype=np.uint16).view(np_dtype)
+    elif datatype in (types_pb2.DT_COMPLEX64, types_pb2.DT_COMPLEX128):
+        # real and imaginary parts are interleaved
+        values = np.asarray(field, dtype=np_dtype.type(0).real.dtype).view(np_dtype)
+    else:
+        values = np.asarray(field, dtype=np_dtype)
+    return _broadcast(values, shape)
+
+def writable(array):
+    """Returns array, or a copy of it if it is read-only.
+
+    The score methods return writable arrays, as tf.contrib.util.make_ndarray
+    did, at the cost of one copy of the whole result.
+    """
+    return array if array.flags.writeable else array.copy()
+
+def _broadcast(values, shape):
+    # like TensorFlow, a single value stands for every element of the tensor
+    size = int(np.prod(shape, dtype=np.int64))
+    if values.size == size:
+        return values.reshape(shape)
+    if values.size == 0:
+        return np.zeros(shape, dtype=values.dtype)
+    if values.size == 1:
+        return np.full(shape, values[0], dtype=values.dtype)
+    raise ValueError("tensor has {0} values but its shape {1} needs {2}".format(values.size, shape, size))
@@ -0,0 +1,6 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+#Benchmarks for the amlrealtimeai client. Run them from the pythonlib folder, e.g.
+# python -m benchmarks.tensor_codec_benchmark
+# python -m benchmarks.loadgen
+#benchmarks.server is a local stand-in PredictionService used by the load generator.
@@ -0,0 +1,192 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Open-loop and closed-loop load generator for PredictionClient.
+
+By default a stand-in server (benchmarks.server) is started in a separate
+process so that its CPU time is not charged to the client, e.g.
+
+    python -m benchmarks.loadgen --workload image:100 --workload numpy:1x224x224x3 --concurrency 16
+    python -m benchmarks.loadgen --mode open --rate 500 --duration 10 --service-ms 5
+
+Pass --host/--port to drive a real deployment instead. For every workload it
+reports throughput, latency percentiles and client CPU time per request.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.metrics import LatencyHistogram
+
+from amlrealtimeai.protos import types_pb2
+
+class Workload:
+    """A request payload and the client call that sends it."""
+
+    def __init__(self, name: str, send):
+        self.name = name
+        self.send = send
+
+    @staticmethod
+    def parse(spec: str):
+        """image:<kilobytes> sends random encoded bytes, numpy:<shape> a float32 array."""
+        kind, _, argument = spec.partition(':')
+        if kind == 'image':
+            data = os.urandom(int(float(argument or 100) * 1024))
+            return Workload(spec, lambda client: client.score_tensor(data, [1], types_pb2.DT_STRING))
+        if kind == 'numpy':
+            shape = [ int(x) for x in (argument or '1x224x224x3').split('x') ]
+            data = np.random.rand(*shape).astype(np.float32)
+            return Workload(spec, lambda client: client.score_numpy_array(data))
+        raise ValueError("unknown workload {0}".format(spec))
+
+class _Recorder:
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.latencies = LatencyHistogram()
+        self.errors = 0
+
+    def record(self, seconds):
+        with self.__lock:
+            self.latencies.record(seconds * 1e6)
+
+    def error(self):
+        with self.__lock:
+            self.errors += 1
+
+def _summarize(mode, workload, recorder, elapsed, cpu):
+    latencies = recorder.latencies
+    requests = latencies.count + recorder.errors
+    return {
+        'mode': mode,
+        'workload': workload.name,
+        'requests': latencies.count,
+        'errors': recorder.errors,
+        'throughput_rps': latencies.count / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': latencies.percentile(50) / 1000.0,
+        'p90_ms': latencies.percentile(90) / 1000.0,
+        'p99_ms': latencies.percentile(99) / 1000.0,
+        'p999_ms': latencies.percentile(99.9) / 1000.0,
+        'cpu_ms_per_request': cpu * 1000.0 / requests if requests else 0.0,
+    }
+
+def closed_loop(client: PredictionClient, workload: Workload, concurrency: int = 8, duration: float = 10.0, warmup: int = 10):
+    """Runs concurrency workers that each send the next request once the last one returned."""
+    for _ in range(warmup):
+        workload.send(client)
+
+    recorder = _Recorder()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                workload.send(client)
+            except Exception:
+                recorder.error()
+                continue
+            recorder.record(time.perf_counter() - start)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    threads = [ threading.Thread(target=worker) for _ in range(concurrency) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summarize('closed', workload, recorder, time.perf_counter() - start, time.process_time() - cpu_start)
+
+def open_loop(client: PredictionClient, workload: Workload, rate: float = 100.0, duration: float = 10.0,
+              max_outstanding: int = 256, warmup: int = 10, seed: int = None):
+    """Sends requests at Poisson-distributed arrival times, whether or not earlier ones returned.
+
+    Latency is measured from the scheduled arrival time, so queueing inside the
+    client is included instead of hidden (no coordinated omission).
+    """
+    for _ in range(warmup):
+        workload.send(client)
+
+    recorder = _Recorder()
+    arrivals = random.Random(seed)
+
+    def send(scheduled):
+        try:
+            workload.send(client)
+        except Exception:
+            recorder.error()
+            return
+        recorder.record(time.perf_counter() - scheduled)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_outstanding) as executor:
+        scheduled = start
+        while True:
+            scheduled += arrivals.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, scheduled)
+    return _summarize('open', workload, recorder, time.perf_counter() - start, time.process_time() - cpu_start)
+
+def _start_server_process(args):
+    command = [ sys.executable, '-m', 'benchmarks.server', '--distribution', args.service_distribution,
+                '--mean-ms', str(args.service_ms), '--output-size', str(args.output_size) ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return process, int(process.stdout.readline())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate load against a PredictionService')
+    parser.add_argument('--host', type=str, default=None, help='Service to drive, starts a local stand-in if omitted')
+    parser.add_argument('--port', type=int, default=80)
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--workload', action='append', type=str,
+                        help='image:<kilobytes> or numpy:<shape>, may be repeated')
+    parser.add_argument('--concurrency', type=int, default=8, help='Workers in closed-loop mode')
+    parser.add_argument('--rate', type=float, default=100.0, help='Requests per second in open-loop mode')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per workload')
+    parser.add_argument('--service-distribution', choices=['constant', 'uniform', 'exponential', 'lognormal'], default='constant')
+    parser.add_argument('--service-ms', type=float, default=0.0, help='Mean service time of the stand-in server')
+    parser.add_argument('--output-size', type=int, default=1000, help='Outputs per batch item of the stand-in server')
+    args = parser.parse_args(argv)
+
+    server = None
+    host, port = args.host, args.port
+    if host is None:
+        server, port = _start_server_process(args)
+        host = 'localhost'
+
+    try:
+        client = PredictionClient(host, port)
+        results = []
+        for spec in args.workload or [ 'image:100', 'numpy:1x224x224x3', 'numpy:8x224x224x3' ]:
+            workload = Workload.parse(spec)
+            if args.mode == 'open':
+                results.append(open_loop(client, workload, args.rate, args.duration))
+            else:
+                results.append(closed_loop(client, workload, args.concurrency, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print("{0:<8}{1:<22}{2:>9}{3:>7}{4:>11}{5:>9}{6:>9}{7:>9}{8:>9}{9:>11}".format(
+        'mode', 'workload', 'requests', 'errors', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms', 'p999 ms', 'cpu ms/req'))
+    for r in results:
+        print("{mode:<8}{workload:<22}{requests:>9}{errors:>7}{throughput_rps:>11.1f}{p50_ms:>9.2f}{p90_ms:>9.2f}"
+              "{p99_ms:>9.2f}{p999_ms:>9.2f}{cpu_ms_per_request:>11.3f}".format(**r))
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Local stand-in for a deployed PredictionService.
+
+It answers Predict with a float tensor of shape [batch, output_size] after a
+delay drawn from a configurable service-time distribution, so client
+throughput can be measured without an FPGA deployment.
+
+    python -m benchmarks.server --port 50051 --distribution exponential --mean-ms 5
+"""
+import argparse
+import random
+import sys
+import time
+import grpc
+import numpy as np
+from concurrent import futures
+
+from amlrealtimeai import tensor_codec
+
+from amlrealtimeai.protos import predict_pb2, prediction_service_pb2_grpc
+
+DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+class ServiceTime:
+    """Draws service times in seconds from a distribution with the given mean."""
+
+    def __init__(self, distribution: str = 'constant', mean_ms: float = 0.0, sigma: float = 0.5, seed: int = None):
+        if(distribution not in DISTRIBUTIONS):
+            raise ValueError("distribution")
+        if(mean_ms < 0):
+            raise ValueError("mean_ms")
+        self.distribution = distribution
+        self.mean = mean_ms / 1000.0
+        self.sigma = sigma
+        self.__random = random.Random(seed)
+
+    def sample(self):
+        if self.mean == 0:
+            return 0.0
+        if self.distribution == 'uniform':
+            return self.__random.uniform(0, 2 * self.mean)
+        if self.distribution == 'exponential':
+            return self.__random.expovariate(1.0 / self.mean)
+        if self.distribution == 'lognormal':
+            # mu chosen so that the distribution has the requested mean
+            mu = np.log(self.mean) - self.sigma ** 2 / 2
+            return self.__random.lognormvariate(mu, self.sigma)
+        return self.mean
+
+class StandInPredictionService(prediction_service_pb2_grpc.PredictionServiceServicer):
+
+    def __init__(self, service_time: ServiceTime, output_size: int = 1000):
+        self.__service_time = service_time
+        self.__output_size = output_size
+        self.__outputs = {}
+
+    def __output(self, batch):
+        # responses are serialized once per batch size and reused
+        response = self.__outputs.get(batch)
+        if response is None:
+            response = predict_pb2.PredictResponse()
+            tensor_codec.fill_tensor_proto(response.outputs['output_alias'],
+                                           np.random.rand(batch, self.__output_size).astype(np.float32))
+            self.__outputs[batch] = response
+        return response
+
+    def Predict(self, request, context):
+        delay = self.__service_time.sample()
+        if delay > 0:
+            time.sleep(delay)
+        tensor = request.inputs['images']
+        batch = tensor.tensor_shape.dim[0].size if tensor.tensor_shape.dim else 1
+        return self.__output(batch)
+
+def start_server(port: int = 0, service_time: ServiceTime = None, output_size: int = 1000, max_workers: int = 64):
+    """Starts the stand-in service on localhost and returns (server, port)."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
+                         options=[ ('grpc.max_receive_message_length', -1) ])
+    prediction_service_pb2_grpc.add_PredictionServiceServicer_to_server(
+        StandInPredictionService(service_time or ServiceTime(), output_size), server)
+    port = server.add_insecure_port('localhost:{0}'.format(port))
+    server.start()
+    return server, port
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a local stand-in PredictionService')
+    parser.add_argument('--port', type=int, default=0, help='Port to listen on, 0 picks a free port')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='constant')
+    parser.add_argument('--mean-ms', type=float, default=0.0, help='Mean service time in milliseconds')
+    parser.add_argument('--sigma', type=float, default=0.5, help='Shape of the lognormal distribution')
+    parser.add_argument('--output-size', type=int, default=1000, help='Number of outputs per batch item')
+    parser.add_argument('--max-workers', type=int, default=64, help='Server threads, caps the requests served at once')
+    args = parser.parse_args(argv)
+
+    server, port = start_server(args.port, ServiceTime(args.distribution, args.mean_ms, args.sigma),
+                                args.output_size, args.max_workers)
+    # the load generator reads the port from the first line
+    print(port)
+    sys.stdout.flush()
+    server.wait_for_termination()
+
+if __name__ == '__main__':
+    main()
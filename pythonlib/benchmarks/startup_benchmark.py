@@ -0,0 +1,90 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Measures the cold-start cost of importing the client.
+
+Every module is imported in fresh interpreters, which report the wall time
+of the import and the growth of their resident set size. The median over the
+runs is printed, and --top lists the modules that took longest according to
+python -X importtime, e.g.
+
+    python -m benchmarks.startup_benchmark --runs 10 --top 15
+    python -m benchmarks.startup_benchmark --module amlrealtimeai.client --module amlrealtimeai.bulk
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# runs in the child interpreter, RSS is read from /proc where available
+_PROBE = """
+import json, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is the peak RSS, in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+before = rss_kb()
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({ 'import_ms': elapsed * 1000.0, 'rss_mb': rss_kb() / 1024.0, 'rss_delta_mb': (rss_kb() - before) / 1024.0 }))
+"""
+
+_CWD = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(module: str, runs: int = 5):
+    """Imports module in runs fresh interpreters and returns the medians of what they report."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([ sys.executable, '-c', _PROBE, module ], cwd=_CWD, universal_newlines=True)
+        samples.append(json.loads(output))
+    result = { 'module': module, 'runs': runs }
+    for key in ('import_ms', 'rss_mb', 'rss_delta_mb'):
+        result[key] = statistics.median(sample[key] for sample in samples)
+    return result
+
+def slowest_imports(module: str, top: int = 10):
+    """Returns (cumulative microseconds, module) of the top slowest imports from python -X importtime."""
+    process = subprocess.run([ sys.executable, '-X', 'importtime', '-c', 'import ' + module ], cwd=_CWD,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    imports = []
+    for line in process.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        imports.append((int(parts[1]), parts[2].strip()))
+    return sorted(imports, reverse=True)[:top]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import time and memory of the client')
+    parser.add_argument('--module', action='append', type=str,
+                        help='Module to import, may be repeated, defaults to amlrealtimeai and amlrealtimeai.client')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=0, help='Also list the slowest imports of each module')
+    args = parser.parse_args(argv)
+
+    results = [ measure(module, args.runs) for module in args.module or [ 'amlrealtimeai', 'amlrealtimeai.client' ] ]
+    print("{0:<32}{1:>12}{2:>10}{3:>14}".format('module', 'import ms', 'RSS MB', 'RSS delta MB'))
+    for r in results:
+        print("{module:<32}{import_ms:>12.1f}{rss_mb:>10.1f}{rss_delta_mb:>14.1f}".format(**r))
+
+    if args.top:
+        for r in results:
+            print("\nslowest imports of {0} (cumulative ms)".format(r['module']))
+            for microseconds, name in slowest_imports(r['module'], args.top):
+                print("{0:>10.1f}  {1}".format(microseconds / 1000.0, name))
+    return results
+
+if __name__ == '__main__':
+    main()
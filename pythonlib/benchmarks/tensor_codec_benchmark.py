@@ -0,0 +1,88 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compares amlrealtimeai.tensor_codec with tf.contrib.util.
+
+For each input shape it times building a PredictRequest from a float array and
+serializing it, and parsing a serialized tensor back into an array. The
+TensorFlow path is only measured when TensorFlow 1.x is installed.
+"""
+import argparse
+import timeit
+import numpy as np
+
+# imported first so that amlrealtimeai.protos uses TensorFlow's protos, which tf.contrib.util produces
+try:
+    import tensorflow as tf
+    # tf.contrib is loaded lazily, importing it registers tf.contrib.util
+    import tensorflow.contrib  # noqa: F401
+except ImportError:
+    tf = None
+
+from amlrealtimeai import tensor_codec
+from amlrealtimeai.protos import predict_pb2, types_pb2
+
+def _codec_encode(data):
+    request = predict_pb2.PredictRequest()
+    tensor_codec.fill_tensor_proto(request.inputs['images'], data, types_pb2.DT_FLOAT)
+    return request.SerializeToString()
+
+def _codec_decode(serialized):
+    response = predict_pb2.PredictResponse.FromString(serialized)
+    return tensor_codec.make_ndarray(response.outputs['output_alias'])
+
+def _load_tensorflow():
+    if tf is None:
+        return None
+
+    def encode(data):
+        request = predict_pb2.PredictRequest()
+        request.inputs['images'].CopyFrom(tf.contrib.util.make_tensor_proto(data, types_pb2.DT_FLOAT, data.shape))
+        return request.SerializeToString()
+
+    def decode(serialized):
+        response = predict_pb2.PredictResponse.FromString(serialized)
+        return tf.contrib.util.make_ndarray(response.outputs['output_alias'])
+
+    return encode, decode
+
+def _time(func, arg, repeat, number):
+    # best of several runs, reported per call in milliseconds
+    return min(timeit.repeat(lambda: func(arg), repeat=repeat, number=number)) / number * 1000
+
+def run(shapes, repeat=5, number=20):
+    implementations = [ ('tensor_codec', _codec_encode, _codec_decode) ]
+    tf_impl = _load_tensorflow()
+    if tf_impl is not None:
+        implementations.append(('tf.contrib', tf_impl[0], tf_impl[1]))
+
+    results = []
+    for shape in shapes:
+        data = np.random.rand(*shape).astype(np.float32)
+        response = predict_pb2.PredictResponse()
+        tensor_codec.fill_tensor_proto(response.outputs['output_alias'], data)
+        serialized_response = response.SerializeToString()
+
+        for name, encode, decode in implementations:
+            results.append({
+                'implementation': name,
+                'shape': 'x'.join(str(x) for x in shape),
+                'encode_ms': _time(encode, data, repeat, number),
+                'decode_ms': _time(decode, serialized_response, repeat, number),
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tensor encoding and decoding')
+    parser.add_argument('--shape', action='append', type=str,
+                        help='Input shape such as 1x224x224x3, may be repeated')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    shapes = [ [ int(x) for x in shape.split('x') ] for shape in (args.shape or [ '1x224x224x3', '8x224x224x3' ]) ]
+    print("{0:<16}{1:<16}{2:>12}{3:>12}".format('implementation', 'shape', 'encode ms', 'decode ms'))
+    for result in run(shapes, args.repeat, args.number):
+        print("{implementation:<16}{shape:<16}{encode_ms:>12.3f}{decode_ms:>12.3f}".format(**result))
+
+if __name__ == '__main__':
+    main()
@@ -45,17 +45,21 @@ setup(
         'Operating System :: POSIX',
         'Operating System :: Microsoft :: Windows',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
     ],
     keywords=[
         # eg: 'keyword1', 'keyword2', 'keyword3',
     ],
-    install_requires=[ "grpcio"
+    # module level __getattr__ (PEP 562) loads the clients lazily
+    python_requires='>=3.7',
+    # grpc.aio needs grpcio 1.32, the vendored _pb2 modules predate protobuf 3.21
+    install_requires=[ "grpcio>=1.32", "numpy", "protobuf>=3.6,<3.21"
     ],
     extras_require={
         # eg:
         #   'rst': ['docutils>=0.11'],
         #   ':python_version=="2.6"': ['argparse'],
+        'preprocessing': ['pillow'],
     },
     entry_points={
         'console_scripts': [
@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+from concurrent import futures
+
+from amlrealtimeai.external.tensorflow_serving.apis import prediction_service_pb2_grpc
+
+class FakePredictionService(prediction_service_pb2_grpc.PredictionServiceServicer):
+    """In-process PredictionService that answers Predict with predict_func(request, context).
+
+    GetModelMetadata is answered with metadata_func(request, context) if it is given.
+    """
+
+    def __init__(self, predict_func, metadata_func=None):
+        self.predict_func = predict_func
+        self.metadata_func = metadata_func
+        self.calls = 0
+        self.metadata_calls = 0
+
+    def Predict(self, request, context):
+        self.calls += 1
+        return self.predict_func(request, context)
+
+    def GetModelMetadata(self, request, context):
+        self.metadata_calls += 1
+        if self.metadata_func is None:
+            return super().GetModelMetadata(request, context)
+        return self.metadata_func(request, context)
+
+@pytest.fixture
+def prediction_server():
+    """Factory fixture that starts a local gRPC server and returns (service, port)."""
+    servers = []
+
+    def start(predict_func, metadata_func=None):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        service = FakePredictionService(predict_func, metadata_func)
+        prediction_service_pb2_grpc.add_PredictionServiceServicer_to_server(service, server)
+        port = server.add_insecure_port('localhost:0')
+        server.start()
+        servers.append(server)
+        return service, port
+
+    yield start
+
+    for server in servers:
+        server.stop(None)
@@ -0,0 +1,175 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import asyncio
+import tempfile
+import grpc
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.protos import types_pb2
+
+from amlrealtimeai.aio_client import AsyncPredictionClient
+from amlrealtimeai.tensor_codec import make_tensor_proto, make_ndarray
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def make_result(return_data):
+    return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
+    result = mock.MagicMock()
+    result.outputs = { "output_alias": return_tensor }
+    return result
+
+def test_create_async_client():
+    client = AsyncPredictionClient("localhost", 50051)
+    assert client is not None
+
+def test_create_async_client_raises_if_host_is_none():
+    with pytest.raises(ValueError):
+        AsyncPredictionClient(None, 50051)
+
+def test_create_async_client_raises_if_concurrency_is_invalid():
+    with pytest.raises(ValueError):
+        AsyncPredictionClient("localhost", 50051, max_concurrency=0)
+
+def test_async_score_image():
+
+    async def predict_mock(request, timeout):
+        inputs = request.inputs['images'].string_val
+        assert inputs[0].decode('utf-8') == "abc"
+        return make_result(np.asarray([[ 1, 2, 3 ]]))
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = predict_mock
+
+    image_file_path = os.path.join(tempfile.mkdtemp(), "img.png")
+    with open(image_file_path, "w") as image_file:
+        image_file.write("abc")
+
+    client = AsyncPredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: stub_mock
+
+    result = run(client.score_image(image_file_path))
+    assert all([x == y for x, y in zip(result, [1, 2, 3])])
+
+def test_async_score_numpy_array():
+
+    async def predict_mock(request, timeout):
+        inputs = make_ndarray(request.inputs['images'])
+        assert all([x == y for x, y in zip(inputs[0], [ 1, 2, 3 ])])
+        return make_result(np.asarray([[ 11, 22, 33 ]]))
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = predict_mock
+
+    client = AsyncPredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: stub_mock
+
+    result = run(client.score_numpy_array(np.asarray([[1, 2, 3]], dtype='f')))
+    assert all([x == y for x, y in zip(result[0], [ 11, 22, 33 ])])
+
+def test_async_concurrency_is_bounded():
+
+    in_flight = { 'value': 0, 'max': 0 }
+
+    async def predict_mock(request, timeout):
+        in_flight['value'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['value'])
+        await asyncio.sleep(0.01)
+        in_flight['value'] -= 1
+        return make_result(np.asarray([[ 1 ]]))
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = predict_mock
+
+    client = AsyncPredictionClient("localhost", 50051, max_concurrency=3)
+    client._get_grpc_stub = lambda: stub_mock
+
+    async def score_many():
+        data = np.asarray([[1]], dtype='f')
+        return await asyncio.gather(*[client.score_numpy_array(data) for _ in range(10)])
+
+    results = run(score_many())
+    assert len(results) == 10
+    assert in_flight['max'] == 3
+
+def test_async_retrying_rpc_exception():
+
+    first_call = [ True ]
+    channel_mock_loaded = { 'value': 0 }
+    sleeps = []
+
+    def unary_unary(id, request_serializer, response_deserializer):
+        async def predict(req, timeout):
+            if(first_call[0]):
+                first_call[0] = False
+                raise grpc.RpcError()
+            return make_result(np.asarray([[ 11, 22 ]]))
+        return predict
+
+    async def close_channel_mock(grace=None):
+        pass
+
+    def load_channel_mock():
+        channel_mock_loaded['value'] += 1
+        channel_mock = mock.Mock()
+        channel_mock.unary_unary = mock.MagicMock(side_effect=unary_unary)
+        channel_mock.close = close_channel_mock
+        return channel_mock
+
+    async def sleep_mock(delay):
+        sleeps.append(delay)
+
+    client = AsyncPredictionClient("localhost", 50051)
+    client._channel_func = load_channel_mock
+    client._sleep = sleep_mock
+
+    result = run(client.score_numpy_array(np.asarray([[1, 2]], dtype='f')))
+    assert all([x == y for x, y in zip(result[0], [ 11, 22 ])])
+    assert channel_mock_loaded['value'] == 2
+    assert len(sleeps) == 1
+    assert 0.8 <= sleeps[0] <= 1.2
+
+def test_async_close_waits_for_replaced_channels():
+    closed = []
+    channels = []
+
+    def unary_unary(id, request_serializer, response_deserializer):
+        async def predict(req, timeout):
+            if len(channels) == 1:
+                raise grpc.RpcError()
+            return make_result(np.asarray([[ 11, 22 ]]))
+        return predict
+
+    def load_channel_mock():
+        channel_mock = mock.Mock()
+        channel_mock.unary_unary = mock.MagicMock(side_effect=unary_unary)
+
+        async def close_channel_mock(grace=None, channel=channel_mock):
+            # closing with a grace period waits for the calls still in flight
+            if grace is not None:
+                await asyncio.sleep(0.1)
+            closed.append(channel)
+        channel_mock.close = close_channel_mock
+        channels.append(channel_mock)
+        return channel_mock
+
+    async def sleep_mock(delay):
+        pass
+
+    async def score_and_close():
+        client = AsyncPredictionClient("localhost", 50051)
+        client._channel_func = load_channel_mock
+        client._sleep = sleep_mock
+        await client.score_numpy_array(np.asarray([[1, 2]], dtype='f'))
+        assert closed == []
+        await client.close()
+        assert closed == [ channels[1], channels[0] ]
+
+    run(score_and_close())
@@ -0,0 +1,101 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import queue
+import tempfile
+import threading
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.protos import types_pb2
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.tensor_codec import make_tensor_proto
+from amlrealtimeai.batching import BatchingPredictionClient
+
+def make_stub(requests):
+    def predict_mock(request, timeout):
+        inputs = [ x.decode('utf-8') for x in request.inputs['images'].string_val ]
+        assert [ d.size for d in request.inputs['images'].tensor_shape.dim ] == [ len(inputs) ]
+        requests.append(inputs)
+        return_data = np.asarray([[ int(x), int(x) * 10 ] for x in inputs])
+        return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
+        result = mock.MagicMock()
+        result.outputs = { "output_alias": return_tensor }
+        return result
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = mock.MagicMock(side_effect=predict_mock)
+    return stub_mock
+
+def test_create_batching_client_raises_if_batch_size_is_invalid():
+    with pytest.raises(ValueError):
+        BatchingPredictionClient(PredictionClient("localhost", 50051), max_batch_size=0)
+
+def test_batching_score_image():
+    requests = []
+    client = PredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: make_stub(requests)
+
+    image_file_path = os.path.join(tempfile.mkdtemp(), "img.png")
+    with open(image_file_path, "w") as image_file:
+        image_file.write("7")
+
+    with BatchingPredictionClient(client, max_batch_size=4, max_wait_ms=1) as batching_client:
+        result = batching_client.score_image(image_file_path)
+        assert all([x == y for x, y in zip(result, [7, 70])])
+        assert batching_client.batch_sizes == { 1: 1 }
+
+def test_batching_groups_concurrent_requests():
+    requests = []
+    client = PredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: make_stub(requests)
+
+    with BatchingPredictionClient(client, max_batch_size=4, max_wait_ms=1000) as batching_client:
+        futures = [ batching_client.submit_image_bytes(str(i).encode('utf-8')) for i in range(8) ]
+        results = [ future.result() for future in futures ]
+
+        for i, result in enumerate(results):
+            assert all([x == y for x, y in zip(result, [i, i * 10])])
+        assert batching_client.batch_sizes == { 4: 2 }
+        assert sorted(requests) == [ ['0', '1', '2', '3'], ['4', '5', '6', '7'] ]
+
+def test_batching_propagates_errors_to_every_caller():
+    client = PredictionClient("localhost", 50051)
+    client.score_tensor = mock.MagicMock(side_effect=RuntimeError("boom"))
+
+    with BatchingPredictionClient(client, max_batch_size=2, max_wait_ms=1000) as batching_client:
+        futures = [ batching_client.submit_image_bytes(b"a"), batching_client.submit_image_bytes(b"b") ]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+def test_batching_rejects_requests_after_close():
+    batching_client = BatchingPredictionClient(PredictionClient("localhost", 50051))
+    batching_client.close()
+    with pytest.raises(RuntimeError):
+        batching_client.submit_image_bytes(b"a")
+
+def test_batching_completes_a_request_submitted_while_closing():
+    requests = []
+    client = PredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: make_stub(requests)
+    closing = []
+
+    class ClosingQueue(queue.Queue):
+        def put(self, item, *args, **kwargs):
+            if isinstance(item, tuple) and not closing:
+                # close() runs between the submitter's check of closed and its put
+                closing.append(threading.Thread(target=batching_client.close))
+                closing[0].start()
+                closing[0].join(0.1)
+            super().put(item, *args, **kwargs)
+
+    with mock.patch('queue.Queue', ClosingQueue):
+        batching_client = BatchingPredictionClient(client, max_batch_size=4, max_wait_ms=1)
+    future = batching_client.submit_image_bytes(b"7")
+    closing[0].join()
+
+    # nothing is queued behind the stop marker, where it would never be collected
+    assert list(future.result(timeout=5)) == [ 7, 70 ]
@@ -0,0 +1,36 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import numpy as np
+
+from amlrealtimeai.client import PredictionClient
+from benchmarks.loadgen import Workload, closed_loop
+from benchmarks.server import DISTRIBUTIONS, ServiceTime, start_server
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_service_time_has_requested_mean(distribution):
+    service_time = ServiceTime(distribution, mean_ms=5.0, seed=1)
+
+    samples = [ service_time.sample() for _ in range(20000) ]
+
+    assert min(samples) >= 0
+    assert np.mean(samples) == pytest.approx(0.005, rel=0.05)
+
+def test_service_time_raises_on_invalid_settings():
+    with pytest.raises(ValueError):
+        ServiceTime('gamma')
+    with pytest.raises(ValueError):
+        ServiceTime(mean_ms=-1)
+
+def test_closed_loop_against_stand_in_server():
+    server, port = start_server(output_size=10)
+    try:
+        with PredictionClient("localhost", port) as client:
+            result = closed_loop(client, Workload.parse('numpy:2x4'), concurrency=2, duration=0.2, warmup=1)
+    finally:
+        server.stop(None)
+
+    assert result['errors'] == 0
+    assert result['requests'] > 0
+    assert result['throughput_rps'] > 0
+    assert 0 < result['p50_ms'] <= result['p99_ms']
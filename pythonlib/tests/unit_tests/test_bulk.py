@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import itertools
+import json
+import tempfile
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.bulk import iter_inputs, BulkScorer, JsonlResultWriter, NpyShardResultWriter
+
+def make_images(count):
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, "img{0:02d}.png".format(i))
+        with open(path, "w") as image_file:
+            image_file.write(str(i))
+        paths.append(path)
+    return directory, paths
+
+def make_client(fail_on=(), preprocessor=None):
+    def score_image(path, timeout):
+        with open(path) as f:
+            value = int(f.read())
+        if value in fail_on:
+            raise RuntimeError("failed {0}".format(value))
+        return np.asarray([ value, value * 10 ], dtype='f')
+
+    def score_images(paths, processes, max_in_flight, timeout):
+        # like the real one, preprocesses ahead and stops at the first error, whichever image it came from
+        paths = iter(paths)
+        ahead = []
+        while True:
+            for path in itertools.islice(paths, max_in_flight - len(ahead)):
+                ahead.append(score_image(path, timeout))
+            if not ahead:
+                return
+            yield ahead.pop(0)
+
+    client = mock.Mock()
+    client.preprocessor = preprocessor
+    client.score_image = mock.MagicMock(side_effect=score_image)
+    client.score_images = mock.MagicMock(side_effect=score_images)
+    return client
+
+def test_iter_inputs_from_directory_glob_and_manifest():
+    directory, paths = make_images(3)
+    assert list(iter_inputs(directory)) == paths
+    assert sorted(iter_inputs(os.path.join(directory, "*.png"))) == paths
+
+    manifest = os.path.join(directory, "manifest.jsonl")
+    with open(manifest, "w") as f:
+        f.write(json.dumps({ "path": "img01.png" }) + "\n\n")
+        f.write(json.dumps({ "path": paths[2] }) + "\n")
+    assert list(iter_inputs(manifest)) == [ paths[1], paths[2] ]
+
+    manifest = os.path.join(directory, "manifest.txt")
+    with open(manifest, "w") as f:
+        f.write("img00.png\n")
+    assert list(iter_inputs(manifest)) == [ paths[0] ]
+
+def test_create_bulk_scorer_raises_if_max_in_flight_is_invalid():
+    with pytest.raises(ValueError):
+        BulkScorer(make_client(), max_in_flight=0)
+
+def test_bulk_score_to_jsonl_and_resume():
+    directory, paths = make_images(10)
+    output = os.path.join(tempfile.mkdtemp(), "results.jsonl")
+
+    summary = BulkScorer(make_client(fail_on=(3,)), max_in_flight=4).run(iter_inputs(directory), JsonlResultWriter(output))
+    assert summary['scored'] == 9
+    assert summary['failed'] == 1
+    assert summary['skipped'] == 0
+    assert 'latency_p99_ms' in summary
+
+    with open(output) as f:
+        entries = { entry['path']: entry for entry in map(json.loads, f) }
+    assert entries[paths[5]]['output'] == [ 5, 50 ]
+    assert 'error' in entries[paths[3]]
+
+    client = make_client()
+    summary = BulkScorer(client, max_in_flight=4).run(iter_inputs(directory), JsonlResultWriter(output))
+    assert summary['scored'] == 1
+    assert summary['skipped'] == 9
+    client.score_image.assert_called_once_with(paths[3], 10.0)
+
+def test_bulk_score_to_npy_shards_and_resume():
+    directory, paths = make_images(5)
+    output = tempfile.mkdtemp()
+
+    summary = BulkScorer(make_client(), max_in_flight=2).run(iter_inputs(directory), NpyShardResultWriter(output, shard_size=2))
+    assert summary['scored'] == 5
+    assert sorted(os.listdir(output)) == [ 'shard-00000.jsonl', 'shard-00000.npy', 'shard-00001.jsonl', 'shard-00001.npy',
+                                           'shard-00002.jsonl', 'shard-00002.npy' ]
+
+    rows = {}
+    for shard in range(3):
+        outputs = np.load(os.path.join(output, 'shard-{0:05d}.npy'.format(shard)))
+        with open(os.path.join(output, 'shard-{0:05d}.jsonl'.format(shard))) as f:
+            for line, row in zip(f, outputs):
+                rows[json.loads(line)['path']] = row.tolist()
+    assert rows[paths[4]] == [ 4, 40 ]
+    assert len(rows) == 5
+
+    _, more_paths = make_images(1)
+    summary = BulkScorer(make_client(), max_in_flight=2).run(paths + more_paths, NpyShardResultWriter(output, shard_size=2))
+    assert summary['scored'] == 1
+    assert summary['skipped'] == 5
+    assert os.path.exists(os.path.join(output, 'shard-00003.npy'))
+
+def test_bulk_score_with_preprocessor_uses_worker_processes():
+    directory, paths = make_images(10)
+    output = os.path.join(tempfile.mkdtemp(), "results.jsonl")
+    client = make_client(fail_on=(3, 4), preprocessor=mock.Mock())
+
+    summary = BulkScorer(client, max_in_flight=3, processes=2).run(iter_inputs(directory), JsonlResultWriter(output))
+
+    assert summary['scored'] == 8
+    assert summary['failed'] == 2
+    # the images taken along with a failed one are scored again one by one, the rest by a new call
+    assert client.score_images.call_count == 3
+    assert [ call[0][0] for call in client.score_image.call_args_list ] == paths[1:5]
+    assert client.score_images.call_args[0][1:] == (2, 3, 10.0)
+    with open(output) as f:
+        entries = [ json.loads(line) for line in f ]
+    # every path is written once, in order
+    assert [ entry['path'] for entry in entries ] == paths
+    assert [ 'error' in entry for entry in entries ] == [ i in (3, 4) for i in range(10) ]
+
+def test_bulk_score_keeps_results_when_interrupted():
+    directory, paths = make_images(5)
+    output = tempfile.mkdtemp()
+    client = make_client()
+    score_image = client.score_image.side_effect
+
+    def interrupt_at_last(path, timeout):
+        if path == paths[4]:
+            raise KeyboardInterrupt()
+        return score_image(path, timeout)
+    client.score_image.side_effect = interrupt_at_last
+
+    with pytest.raises(KeyboardInterrupt):
+        BulkScorer(client, max_in_flight=1).run(paths, NpyShardResultWriter(output, shard_size=10))
+
+    # the buffered rows are written although the shard is not full
+    assert len(np.load(os.path.join(output, 'shard-00000.npy'))) == 4
+    summary = BulkScorer(make_client(), max_in_flight=1).run(paths, NpyShardResultWriter(output, shard_size=10))
+    assert summary['skipped'] == 4
+    assert summary['scored'] == 1
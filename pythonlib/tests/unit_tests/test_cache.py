@@ -0,0 +1,217 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from datetime import timedelta
+from unittest import mock
+
+from amlrealtimeai.cache import ResultCache
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.protos import types_pb2
+from amlrealtimeai.tensor_codec import make_tensor_proto
+
+def make_stub():
+    def predict_mock(request, timeout):
+        result = mock.MagicMock()
+        result.outputs = { "output_alias": make_tensor_proto(np.asarray([[ 1, 2, 3 ]], dtype='f')) }
+        return result
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = mock.MagicMock(side_effect=predict_mock)
+    return stub_mock
+
+def test_create_cache_raises_if_max_entries_is_invalid():
+    with pytest.raises(ValueError):
+        ResultCache(max_entries=0)
+
+def test_make_key_depends_on_dtype_and_shape():
+    data = np.zeros(4, dtype=np.float32)
+    assert ResultCache.make_key(data) == ResultCache.make_key(np.zeros(4, dtype=np.float32))
+    assert ResultCache.make_key(data) != ResultCache.make_key(data.reshape(2, 2))
+    assert ResultCache.make_key(data) != ResultCache.make_key(data.view(np.int32))
+    assert ResultCache.make_key('ab', b'c') != ResultCache.make_key('a', b'bc')
+
+def test_make_key_hashes_the_elements_of_object_arrays():
+    key = ResultCache.make_key(np.asarray([ b'hello' ], dtype=object))
+    assert ResultCache.make_key(np.asarray([ b'hello' ], dtype=object)) == key
+    assert ResultCache.make_key(np.asarray([ 'hello' ], dtype=object)) == key
+    assert ResultCache.make_key(np.asarray([ b'hellp' ], dtype=object)) != key
+    assert ResultCache.make_key(np.asarray([ b'ab', b'c' ], dtype=object)) != \
+        ResultCache.make_key(np.asarray([ b'a', b'bc' ], dtype=object))
+    with pytest.raises(TypeError):
+        ResultCache.make_key(np.asarray([ 1.5, None ], dtype=object))
+
+def test_client_caches_string_tensors():
+    client = PredictionClient("localhost", 50051, cache=ResultCache())
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+
+    client.score_numpy_array([ b'hello' ], datatype=types_pb2.DT_STRING)
+    client.score_numpy_array([ b'hello' ], datatype=types_pb2.DT_STRING)
+    client.score_numpy_array([ b'world' ], datatype=types_pb2.DT_STRING)
+
+    assert stub.Predict.call_count == 2
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', np.asarray([1]))
+    cache.put('b', np.asarray([2]))
+    assert cache.get('a') is not None
+    cache.put('c', np.asarray([3]))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    stats = cache.stats
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+    assert stats['entries'] == 2
+
+def test_ttl_expiration():
+    now = [ 1000.0 ]
+    cache = ResultCache(ttl=timedelta(seconds=10))
+    with mock.patch('time.monotonic', lambda: now[0]):
+        cache.put('a', np.asarray([1]))
+        now[0] += 5
+        assert cache.get('a') is not None
+        now[0] += 6
+        assert cache.get('a') is None
+    assert cache.stats['expirations'] == 1
+
+def test_disk_hits_keep_their_age():
+    directory = tempfile.mkdtemp()
+    ResultCache(directory=directory).put('a', np.asarray([1]))
+    path = os.path.join(directory, 'a', 'a.npy')
+    written = os.path.getmtime(path) - 8
+    os.utime(path, (written, written))
+
+    cache = ResultCache(ttl=timedelta(seconds=10), directory=directory)
+    assert cache.get('a') is not None
+    # without the file's age the entry would live another 10 seconds in memory
+    later = { 'monotonic': time.monotonic() + 3, 'time': time.time() + 3 }
+    with mock.patch('time.monotonic', lambda: later['monotonic']), mock.patch('time.time', lambda: later['time']):
+        assert cache.get('a') is None
+    assert cache.stats['expirations'] >= 1
+
+def test_cached_values_are_read_only():
+    cache = ResultCache()
+    value = cache.put('a', np.asarray([1, 2]))
+    with pytest.raises(ValueError):
+        value[0] = 5
+
+def test_client_returns_writable_copies_of_cached_results():
+    client = PredictionClient("localhost", 50051, cache=ResultCache())
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+    data = np.asarray([[ 1 ]], dtype='f')
+
+    first = client.score_numpy_array(data)
+    first[0][0] = 42
+    second = client.score_numpy_array(data)
+
+    assert list(second[0]) == [ 1, 2, 3 ]
+    second[0][0] = 42
+    assert stub.Predict.call_count == 1
+
+def test_disk_tier():
+    directory = tempfile.mkdtemp()
+    cache = ResultCache(max_entries=1, directory=directory)
+    cache.put('a', np.asarray([1, 2]))
+    cache.put('b', np.asarray([3, 4]))
+
+    assert list(cache.get('a')) == [ 1, 2 ]
+    assert cache.stats['disk_hits'] == 1
+
+    # a new cache over the same directory still has the results
+    assert list(ResultCache(directory=directory).get('b')) == [ 3, 4 ]
+
+def test_disk_tier_size_limit():
+    directory = tempfile.mkdtemp()
+    value = np.zeros(100, dtype=np.float32)
+    cache = ResultCache(max_entries=1, directory=directory, max_disk_bytes=1100)
+    for key in [ 'a', 'b', 'c' ]:
+        cache.put(key, value)
+
+    # each file is 400 bytes of data plus the .npy header, only two fit
+    assert cache.stats['disk_evictions'] == 1
+    assert cache.stats['disk_bytes'] <= 1100
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+
+    # a new cache over the same directory counts the files already there
+    cache = ResultCache(directory=directory, max_disk_bytes=600)
+    assert cache.stats['disk_evictions'] == 1
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+def test_client_keys_depend_on_endpoint():
+    cache = ResultCache()
+    stubs = []
+    for port in [ 50051, 50051, 50052 ]:
+        client = PredictionClient("localhost", port, cache=cache)
+        stubs.append(make_stub())
+        client._get_grpc_stub = lambda stub=stubs[-1]: stub
+        client.score_numpy_array(np.asarray([[ 1 ]], dtype='f'))
+
+    # the second client talks to the same deployment as the first, the third does not
+    assert [ stub.Predict.call_count for stub in stubs ] == [ 1, 0, 1 ]
+
+def test_get_or_compute_coalesces_concurrent_requests():
+    cache = ResultCache()
+    calls = { 'value': 0 }
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        calls['value'] += 1
+        started.set()
+        release.wait(5)
+        return np.asarray([42])
+
+    results = []
+    threads = [ threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute))) for _ in range(5) ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls['value'] == 1
+    assert [ list(r) for r in results ] == [ [42] ] * 5
+
+def test_get_or_compute_does_not_cache_errors():
+    cache = ResultCache()
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', mock.MagicMock(side_effect=RuntimeError("boom")))
+    assert list(cache.get_or_compute('k', lambda: np.asarray([1]))) == [ 1 ]
+
+def test_client_serves_duplicate_images_from_cache():
+    cache = ResultCache()
+    client = PredictionClient("localhost", 50051, cache=cache)
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+
+    directory = tempfile.mkdtemp()
+    paths = []
+    for name, content in [ ("a.png", "abc"), ("b.png", "abc"), ("c.png", "def") ]:
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], "w") as image_file:
+            image_file.write(content)
+
+    results = [ client.score_image(path) for path in paths ]
+    assert all([ list(r) == [ 1, 2, 3 ] for r in results ])
+    assert stub.Predict.call_count == 2
+
+    client.score_numpy_array(np.asarray([[1, 2]], dtype='f'))
+    client.score_numpy_array(np.asarray([[1, 2]], dtype='f'))
+    assert stub.Predict.call_count == 3
+    assert cache.stats['hits'] == 2
@@ -4,19 +4,14 @@ import pytest
 import os
 import tempfile
 import grpc
-import tensorflow as tf
 import numpy as np
 from unittest import mock
 from datetime import datetime, timedelta
 
-try:
-    from tensorflow.core.framework import tensor_shape_pb2
-    from tensorflow.core.framework import types_pb2
-except ImportError:
-    from .tensorflow.core.framework import tensor_shape_pb2
-    from .tensorflow.core.framework import types_pb2
+from amlrealtimeai.protos import tensor_shape_pb2, types_pb2
 
 from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.tensor_codec import make_tensor_proto, make_ndarray
 
 def test_create_client():
     client = PredictionClient("localhost", 50051)
@@ -41,7 +36,7 @@ def test_score_image():
         inputs = request.inputs['images'].string_val
         assert inputs[0].decode('utf-8') == "abc"
         return_data = np.asarray([[ 1, 2, 3 ]])
-        return_tensor = tf.contrib.util.make_tensor_proto(return_data, types_pb2.DT_FLOAT, return_data.shape)
+        return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
         result = mock.MagicMock()
         result.outputs = { "output_alias": return_tensor }
         return result
@@ -59,17 +54,19 @@ def test_score_image():
 
     result = client.score_image(image_file_path)
     assert all([x == y for x, y in zip(result, [1, 2, 3])])
+    # callers may modify results in place, as with tf.contrib.util.make_ndarray
+    result[0] = 0
 
 
 def test_score_numpy_array():
 
     def predict_mock(request, timeout):
-        inputs = tf.contrib.util.make_ndarray(request.inputs['images'])
+        inputs = make_ndarray(request.inputs['images'])
         assert all([x == y for x, y in zip(inputs[0], [ 1, 2, 3 ])])
         assert all([x == y for x, y in zip(inputs[1], [ 4, 5, 6 ])])
 
         return_data = np.asarray([[ 11, 22, 33 ], [ 44, 55, 66 ]])
-        return_tensor = tf.contrib.util.make_tensor_proto(return_data, types_pb2.DT_FLOAT, return_data.shape)
+        return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
         result = mock.MagicMock()
         result.outputs = { "output_alias": return_tensor }
         return result
@@ -83,6 +80,7 @@ def test_score_numpy_array():
     result = client.score_numpy_array(np.asarray([[1, 2, 3], [4, 5, 6]], dtype='f'))
     assert all([x == y for x, y in zip(result[0], [ 11, 22, 33 ])])
     assert all([x == y for x, y in zip(result[1], [ 44, 55, 66 ])])
+    result[0][0] = 0
 
 
 def test_retrying_rpc_exception():
@@ -100,7 +98,7 @@ def test_retrying_rpc_exception():
                 return lambda req, timeout: (_ for _ in ()).throw(grpc.RpcError())
 
             return_data = np.asarray([[ 11, 22 ]])
-            return_tensor = tf.contrib.util.make_tensor_proto(return_data, types_pb2.DT_FLOAT, return_data.shape)
+            return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
             result.outputs = { "output_alias": return_tensor }
         return lambda req, timeout: result
 
@@ -125,7 +123,10 @@ def test_retrying_rpc_exception():
     assert all([x == y for x, y in zip(result[0], [ 11, 22 ])])
 
     assert channel_mock_loaded['value'] == 2
-    assert channel_mock_closed['value'] == 1
+    # the replaced channel is closed after a grace period for calls still in flight, or by close()
+    assert channel_mock_closed['value'] == 0
+    client.close()
+    assert channel_mock_closed['value'] == 2
 
 def test_create_new_channel_after_timeout_expires():
 
@@ -135,7 +136,7 @@ def test_create_new_channel_after_timeout_expires():
         result = mock.MagicMock()
         if id == '/tensorflow.serving.PredictionService/Predict':
             return_data = np.asarray([[ 1, 2, 3 ]])
-            return_tensor = tf.contrib.util.make_tensor_proto(return_data, types_pb2.DT_FLOAT, return_data.shape)
+            return_tensor = make_tensor_proto(return_data, types_pb2.DT_FLOAT)
             result.outputs = { "output_alias": return_tensor }
         return lambda req, timeout: result
 
@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import subprocess
+import sys
+
+import amlrealtimeai
+
+def imported_modules(statement, path=None):
+    # a fresh interpreter, the test process has imported everything already
+    code = "import sys\n{0}\nprint('\\n'.join(sys.modules))".format(statement)
+    cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    if path is not None:
+        env['PYTHONPATH'] = os.pathsep.join([ path, env.get('PYTHONPATH', '') ])
+    return subprocess.check_output([ sys.executable, '-c', code ], cwd=cwd, env=env, universal_newlines=True).split()
+
+def test_importing_client_skips_unused_modules():
+    modules = imported_modules("import amlrealtimeai.client")
+
+    assert 'amlrealtimeai.client' in modules
+    for module in ('tensorflow', 'PIL', 'multiprocessing', 'amlrealtimeai.aio_client',
+                   'amlrealtimeai.external.tensorflow_serving.apis.prediction_service_pb2_grpc'):
+        assert module not in modules
+
+def test_installed_tensorflow_is_not_imported(tmpdir):
+    # stands in for an installed TensorFlow, importing it fails the subprocess
+    tmpdir.mkdir('tensorflow').join('__init__.py').write("raise RuntimeError('tensorflow was imported')\n")
+
+    modules = imported_modules("import amlrealtimeai.client\n"
+                               "from amlrealtimeai.client import PredictionClient\n"
+                               "from amlrealtimeai.tensor_codec import make_tensor_proto\n"
+                               "from amlrealtimeai.protos import get_model_metadata_pb2, predict_pb2\n"
+                               "request = predict_pb2.PredictRequest()\n"
+                               "request.inputs['images'].CopyFrom(make_tensor_proto([ 1.0 ]))", str(tmpdir))
+
+    assert 'amlrealtimeai.client' in modules
+    assert 'tensorflow' not in modules
+
+def test_importing_package_loads_no_client():
+    modules = imported_modules("import amlrealtimeai")
+
+    assert 'amlrealtimeai.client' not in modules
+    assert 'grpc' not in modules
+
+def test_package_exports_are_loaded_on_access():
+    from amlrealtimeai.client import PredictionClient
+    from amlrealtimeai.aio_client import AsyncPredictionClient
+
+    assert amlrealtimeai.PredictionClient is PredictionClient
+    assert amlrealtimeai.AsyncPredictionClient is AsyncPredictionClient
+    assert 'PooledPredictionClient' in dir(amlrealtimeai)
+    with pytest.raises(AttributeError):
+        amlrealtimeai.NoSuchClient
@@ -0,0 +1,112 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.metrics import LatencyHistogram, ClientMetrics
+from amlrealtimeai.tensor_codec import make_tensor_proto
+
+def make_stub(fail_first=0):
+    calls = { 'value': 0 }
+
+    def predict_mock(request, timeout):
+        calls['value'] += 1
+        if calls['value'] <= fail_first:
+            raise grpc.RpcError()
+        result = mock.MagicMock()
+        result.outputs = { "output_alias": make_tensor_proto(np.asarray([[ 1, 2, 3 ]], dtype='f')) }
+        return result
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = mock.MagicMock(side_effect=predict_mock)
+    return stub_mock
+
+def test_histogram_percentiles_are_within_precision():
+    histogram = LatencyHistogram()
+    for value in range(1, 100001):
+        histogram.record(value)
+
+    assert histogram.count == 100000
+    assert histogram.min == 1
+    assert histogram.max == 100000
+    for percentile in [ 50, 99, 99.9 ]:
+        expected = percentile * 1000
+        assert abs(histogram.percentile(percentile) - expected) <= expected / 64
+
+def test_histogram_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in [ 0, 1, 2, 3 ]:
+        histogram.record(value)
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(100) == 3
+
+def test_histogram_merge():
+    first = LatencyHistogram()
+    second = LatencyHistogram()
+    first.record(10)
+    second.record(1000)
+    first.merge(second)
+    assert first.count == 2
+    assert first.max == 1000
+    assert first.percentile(100) == 1000
+
+def test_histogram_rejects_invalid_sub_buckets():
+    with pytest.raises(ValueError):
+        LatencyHistogram(sub_buckets=10)
+
+def test_client_records_call_phases():
+    metrics = ClientMetrics()
+    client = PredictionClient("localhost", 50051, metrics=metrics)
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+
+    client.score_numpy_array(np.asarray([[1, 2, 3]], dtype='f'))
+    client.score_tensor(b"abc", [1], 7)
+
+    result = metrics.as_dict()
+    assert result['calls'] == 2
+    assert result['retries'] == 0
+    assert result['request_bytes'] > 0
+    assert result['response_bytes'] > 0
+    assert result['latency_ms']['total']['count'] == 2
+    assert result['latency_ms']['wait']['count'] == 2
+    assert result['latency_ms']['serialize']['count'] == 2
+    # score_tensor returns the raw tensor, so only score_numpy_array decodes
+    assert result['latency_ms']['deserialize']['count'] == 1
+
+def test_client_records_retries():
+    metrics = ClientMetrics()
+    client = PredictionClient("localhost", 50051, metrics=metrics)
+    stub = make_stub(fail_first=1)
+    client._get_grpc_stub = lambda: stub
+
+    with mock.patch('time.sleep'):
+        client.score_numpy_array(np.asarray([[1, 2, 3]], dtype='f'))
+
+    assert metrics.as_dict()['retries'] == 1
+
+def test_prometheus_export():
+    metrics = ClientMetrics()
+    client = PredictionClient("localhost", 50051, metrics=metrics)
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+    client.score_numpy_array(np.asarray([[1, 2, 3]], dtype='f'))
+
+    text = metrics.to_prometheus()
+    assert '# TYPE amlrealtimeai_client_latency_seconds summary' in text
+    assert 'amlrealtimeai_client_latency_seconds{phase="wait",quantile="0.99"}' in text
+    assert 'amlrealtimeai_client_latency_seconds_count{phase="total"} 1' in text
+    assert 'amlrealtimeai_client_calls_total 1' in text
+
+    metrics.reset()
+    assert metrics.as_dict()['calls'] == 0
+
+def test_client_without_metrics():
+    client = PredictionClient("localhost", 50051)
+    stub = make_stub()
+    client._get_grpc_stub = lambda: stub
+    client.score_numpy_array(np.asarray([[1, 2, 3]], dtype='f'))
+    assert client.metrics is None
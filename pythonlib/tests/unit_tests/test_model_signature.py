@@ -0,0 +1,141 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+import numpy as np
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.external.tensorflow_serving.apis import get_model_metadata_pb2
+from amlrealtimeai.external.tensorflow_serving.apis import predict_pb2
+from amlrealtimeai.protos import types_pb2
+from amlrealtimeai.retry import RetryPolicy
+from amlrealtimeai.signature import TensorSpec
+from amlrealtimeai.tensor_codec import fill_tensor_proto, make_ndarray
+
+def add_tensor_info(tensor_infos, alias, datatype, shape):
+    info = tensor_infos[alias]
+    info.name = alias + ":0"
+    info.dtype = datatype
+    for size in shape:
+        info.tensor_shape.dim.add().size = size
+
+def metadata(signature_names=('serving_default',)):
+    def get_model_metadata(request, context):
+        signatures = get_model_metadata_pb2.SignatureDefMap()
+        for name in signature_names:
+            signature = signatures.signature_def[name]
+            add_tensor_info(signature.inputs, 'images', types_pb2.DT_FLOAT, [ -1, 2 ])
+            add_tensor_info(signature.inputs, 'scale', types_pb2.DT_INT32, [])
+            add_tensor_info(signature.outputs, 'scores', types_pb2.DT_FLOAT, [ -1, 2 ])
+            add_tensor_info(signature.outputs, 'classes', types_pb2.DT_INT64, [ -1 ])
+            signature.method_name = 'tensorflow/serving/predict'
+        response = get_model_metadata_pb2.GetModelMetadataResponse()
+        response.model_spec.name = request.model_spec.name
+        response.metadata['signature_def'].Pack(signatures)
+        return response
+    return get_model_metadata
+
+def predict(request, context):
+    images = make_ndarray(request.inputs['images'])
+    scale = make_ndarray(request.inputs['scale'])
+    outputs = { 'scores': (images * scale).astype(np.float32), 'classes': np.argmax(images, axis=1).astype(np.int64) }
+    response = predict_pb2.PredictResponse()
+    for alias, values in outputs.items():
+        if not request.output_filter or alias in request.output_filter:
+            fill_tensor_proto(response.outputs[alias], values)
+    return response
+
+def test_get_model_signature_is_cached_per_channel(prediction_server):
+    service, port = prediction_server(predict, metadata())
+    client = PredictionClient("localhost", port)
+
+    signature = client.get_model_signature()
+    assert signature.name == 'serving_default'
+    assert sorted(signature.inputs) == [ 'images', 'scale' ]
+    assert signature.inputs['images'].datatype == types_pb2.DT_FLOAT
+    assert signature.inputs['images'].shape == [ -1, 2 ]
+    assert signature.outputs['classes'].datatype == types_pb2.DT_INT64
+
+    assert client.get_model_signature() is signature
+    assert service.metadata_calls == 1
+
+    client.close()
+    assert client.get_model_signature() is not signature
+    assert service.metadata_calls == 2
+
+def test_get_model_signature_picks_only_or_named_signature(prediction_server):
+    _, port = prediction_server(predict, metadata(('classify', 'detect')))
+    client = PredictionClient("localhost", port)
+
+    assert client.get_model_signature('detect').name == 'detect'
+    with pytest.raises(ValueError):
+        client.get_model_signature()
+
+    _, port = prediction_server(predict, metadata(('classify',)))
+    assert PredictionClient("localhost", port).get_model_signature().name == 'classify'
+
+def test_score_sends_several_inputs_and_returns_several_outputs(prediction_server):
+    _, port = prediction_server(predict, metadata())
+    client = PredictionClient("localhost", port)
+
+    # float64 images and a Python int are sent as the float32 and int32 the model declares
+    results = client.score({ 'images': np.asarray([[ 1.0, 3.0 ], [ 4.0, 2.0 ]]), 'scale': 2 })
+
+    assert sorted(results) == [ 'classes', 'scores' ]
+    assert results['scores'].dtype == np.float32
+    assert np.array_equal(results['scores'], [[ 2, 6 ], [ 8, 4 ]])
+    assert list(results['classes']) == [ 1, 0 ]
+
+def test_score_fetches_only_requested_outputs(prediction_server):
+    _, port = prediction_server(predict, metadata())
+    client = PredictionClient("localhost", port)
+
+    results = client.score({ 'images': np.ones((1, 2), dtype='f'), 'scale': 1 }, outputs=[ 'classes' ])
+
+    assert list(results) == [ 'classes' ]
+
+@pytest.mark.parametrize("inputs, outputs", [
+    ({ 'images': np.ones((1, 2), dtype='f') }, None),
+    ({ 'images': np.ones((1, 2), dtype='f'), 'scale': 1, 'extra': 1 }, None),
+    ({ 'images': np.ones((1, 3), dtype='f'), 'scale': 1 }, None),
+    ({ 'images': np.ones((2,), dtype='f'), 'scale': 1 }, None),
+    ({ 'images': np.ones((1, 2), dtype='f'), 'scale': 1.5 }, None),
+    ({ 'images': [[ "a", "b" ]], 'scale': 1 }, None),
+    ({ 'images': np.ones((1, 2), dtype='f'), 'scale': 1 }, [ 'probabilities' ]),
+])
+def test_score_rejects_malformed_requests_without_calling_predict(prediction_server, inputs, outputs):
+    service, port = prediction_server(predict, metadata())
+    client = PredictionClient("localhost", port)
+
+    with pytest.raises(ValueError):
+        client.score(inputs, outputs)
+    assert service.calls == 0
+
+@pytest.mark.parametrize("datatype, values, accepted", [
+    (types_pb2.DT_FLOAT, np.ones(2, dtype=np.float64), True),
+    (types_pb2.DT_FLOAT, [ 1, 2 ], True),
+    (types_pb2.DT_INT32, 3, True),
+    (types_pb2.DT_INT32, np.int64(2 ** 40), False),
+    (types_pb2.DT_INT32, np.ones(2, dtype=np.float32), False),
+    (types_pb2.DT_HALF, np.ones(2, dtype=np.float64), False),
+    (types_pb2.DT_HALF, [ 70000 ], False),
+    (types_pb2.DT_UINT8, [ -1 ], False),
+])
+def test_tensor_spec_accepts_only_lossless_casts(datatype, values, accepted):
+    spec = TensorSpec('x:0', datatype)
+    if accepted:
+        assert spec.check('x', values).shape == np.shape(values)
+    else:
+        with pytest.raises(ValueError):
+            spec.check('x', values)
+
+def test_score_without_validation_infers_types(prediction_server):
+    service, port = prediction_server(predict)
+    client = PredictionClient("localhost", port, retry_policy=RetryPolicy(max_attempts=1))
+
+    with pytest.raises(grpc.RpcError):
+        client.get_model_signature()
+
+    results = client.score({ 'images': np.asarray([[ 1, 5 ]], dtype='f'), 'scale': np.int32(3) }, validate=False)
+    assert np.array_equal(results['scores'], [[ 3, 15 ]])
+    assert service.calls == 1
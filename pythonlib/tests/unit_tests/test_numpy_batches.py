@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.protos import types_pb2
+
+from amlrealtimeai.cache import ResultCache
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.tensor_codec import make_tensor_proto, make_ndarray
+
+def make_client(requests):
+    in_flight = { 'value': 0, 'max': 0 }
+    lock = threading.Lock()
+
+    def predict_mock(request, timeout):
+        with lock:
+            in_flight['value'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['value'])
+        inputs = make_ndarray(request.inputs['images'])
+        requests.append(request.inputs['images'].dtype)
+        time.sleep(0.01)
+        result = mock.MagicMock()
+        # one output row per input row: the row sum and twice the row sum
+        sums = inputs.astype(np.float32).reshape(len(inputs), -1).sum(axis=1)
+        result.outputs = { "output_alias": make_tensor_proto(np.stack([ sums, sums * 2 ], axis=1)) }
+        with lock:
+            in_flight['value'] -= 1
+        return result
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = mock.MagicMock(side_effect=predict_mock)
+    client = PredictionClient("localhost", 50051)
+    client._get_grpc_stub = lambda: stub_mock
+    return client, stub_mock, in_flight
+
+def expected_output(data):
+    sums = data.astype(np.float32).reshape(len(data), -1).sum(axis=1)
+    return np.stack([ sums, sums * 2 ], axis=1)
+
+def test_score_numpy_batches_splits_and_reassembles():
+    requests = []
+    client, stub, in_flight = make_client(requests)
+    data = np.random.rand(103, 4, 3).astype(np.float32)
+
+    result = client.score_numpy_batches(data, batch_size=10, max_in_flight=3)
+
+    assert result.shape == (103, 2)
+    assert np.allclose(result, expected_output(data))
+    assert stub.Predict.call_count == 11
+    assert in_flight['max'] <= 3
+    assert all(dtype == types_pb2.DT_FLOAT for dtype in requests)
+
+def test_score_numpy_batches_from_memmapped_file_into_memmap():
+    requests = []
+    client, stub, _ = make_client(requests)
+    directory = tempfile.mkdtemp()
+    input_path = os.path.join(directory, "input.npy")
+    output_path = os.path.join(directory, "output.npy")
+    data = np.random.randint(0, 255, size=(25, 8)).astype(np.uint8)
+    np.save(input_path, data)
+
+    result = client.score_numpy_batches(input_path, batch_size=8, out_path=output_path, datatype=types_pb2.DT_UINT8)
+
+    assert isinstance(result, np.memmap)
+    assert np.allclose(np.load(output_path), expected_output(data))
+    assert all(dtype == types_pb2.DT_UINT8 for dtype in requests)
+
+def test_score_numpy_batches_into_preallocated_array():
+    requests = []
+    client, _, _ = make_client(requests)
+    data = np.random.rand(6, 2)
+    out = np.zeros((6, 2), dtype=np.float32)
+
+    result = client.score_numpy_batches(data, batch_size=4, out=out, datatype=types_pb2.DT_HALF)
+
+    assert result is out
+    assert np.allclose(out, expected_output(data.astype(np.float16)))
+    assert all(dtype == types_pb2.DT_HALF for dtype in requests)
+
+def test_score_numpy_batches_raises_on_mismatched_output():
+    client = PredictionClient("localhost", 50051)
+    result = mock.MagicMock()
+    result.outputs = { "output_alias": make_tensor_proto(np.zeros((1, 2), dtype='f')) }
+    stub = mock.Mock()
+    stub.Predict = mock.MagicMock(return_value=result)
+    client._get_grpc_stub = lambda: stub
+
+    with pytest.raises(ValueError):
+        client.score_numpy_batches(np.zeros((4, 2)), batch_size=2)
+
+def test_score_numpy_batches_raises_if_batch_size_is_invalid():
+    with pytest.raises(ValueError):
+        PredictionClient("localhost", 50051).score_numpy_batches(np.zeros((4, 2)), batch_size=0)
+
+@pytest.mark.parametrize("score", [
+    lambda client, data: client.score_numpy_batches(data, batch_size=2, datatype=types_pb2.DT_UINT8),
+    lambda client, data: client.score_numpy_array(data, datatype=types_pb2.DT_UINT8),
+    lambda client, data: client.score_numpy_arrays([ data ], datatype=types_pb2.DT_UINT8),
+])
+def test_score_numpy_raises_on_lossy_datatype(score):
+    requests = []
+    client, stub, _ = make_client(requests)
+
+    with pytest.raises(ValueError):
+        score(client, [[ 0.2, 0.9 ], [ 3.7, -1.5 ]])
+    assert stub.Predict.call_count == 0
+
+def test_score_numpy_array_checks_datatype_before_cache_lookup():
+    requests = []
+    _, stub, _ = make_client(requests)
+    client = PredictionClient("localhost", 50051, cache=ResultCache())
+    client._get_grpc_stub = lambda: stub
+
+    with pytest.raises(ValueError):
+        client.score_numpy_array(np.random.rand(2, 2), datatype=types_pb2.DT_UINT8)
+    # integers may be sent as floats
+    client.score_numpy_array([[ 1, 2 ]])
+    assert requests == [ types_pb2.DT_FLOAT ]
@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+import threading
+import time
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.external.tensorflow_serving.apis import predict_pb2
+from amlrealtimeai.pipelined import PipelinedPredictionClient
+from amlrealtimeai.retry import RetryPolicy
+from amlrealtimeai.tensor_codec import fill_tensor_proto, make_ndarray
+
+def echo(delay=0.0, fail_first=0):
+    state = { 'in_flight': 0, 'max_in_flight': 0, 'failures': 0 }
+    lock = threading.Lock()
+
+    def predict(request, context):
+        with lock:
+            if state['failures'] < fail_first:
+                state['failures'] += 1
+                context.abort(grpc.StatusCode.UNAVAILABLE, "unavailable")
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        # later requests finish first, results must still come back in order
+        values = make_ndarray(request.inputs['images'])
+        time.sleep(delay * (1.0 - float(values.flat[0]) / 10.0))
+        response = predict_pb2.PredictResponse()
+        fill_tensor_proto(response.outputs['output_alias'], values * 2)
+        with lock:
+            state['in_flight'] -= 1
+        return response
+
+    return predict, state
+
+def test_preconnects_and_keeps_channel(prediction_server):
+    predict, _ = echo()
+    service, port = prediction_server(predict)
+
+    with PipelinedPredictionClient("localhost", port) as client:
+        stub = client._get_grpc_stub()
+        client.score_numpy_array(np.asarray([[1]], dtype='f'))
+        assert client._get_grpc_stub() is stub
+        assert client._channel_generation == 1
+    assert service.calls == 1
+
+def test_score_numpy_arrays_is_concurrent_and_ordered(prediction_server):
+    predict, state = echo(delay=0.05)
+    _, port = prediction_server(predict)
+
+    with PipelinedPredictionClient("localhost", port, max_in_flight=8) as client:
+        arrays = [ np.asarray([[i]], dtype='f') for i in range(8) ]
+        results = client.score_numpy_arrays(arrays)
+
+    assert [ result[0][0] for result in results ] == [ i * 2 for i in range(8) ]
+    assert state['max_in_flight'] > 1
+
+def test_score_numpy_batches_uses_futures(prediction_server):
+    predict, _ = echo()
+    _, port = prediction_server(predict)
+
+    with PipelinedPredictionClient("localhost", port) as client:
+        data = np.arange(10, dtype='f').reshape(10, 1)
+        result = client.score_numpy_batches(data, batch_size=3)
+
+    assert np.array_equal(result, data * 2)
+
+def test_failed_calls_are_retried(prediction_server):
+    predict, _ = echo(fail_first=2)
+    service, port = prediction_server(predict)
+
+    policy = RetryPolicy(initial_backoff=0.01, jitter=0)
+    with PipelinedPredictionClient("localhost", port, retry_policy=policy) as client:
+        results = client.score_numpy_arrays([ np.asarray([[i]], dtype='f') for i in range(3) ])
+
+    assert [ result[0][0] for result in results ] == [ 0, 2, 4 ]
+    assert service.calls == 5
+
+@pytest.mark.parametrize("policy, attempts", [
+    (RetryPolicy(max_attempts=3, initial_backoff=0.01, jitter=0), 3),
+    # the deadline starts with the first attempt, not with the retry
+    (RetryPolicy(max_attempts=10, initial_backoff=0.2, backoff_multiplier=1, jitter=0, deadline=0.3), 2),
+])
+def test_retries_keep_to_the_policy(prediction_server, policy, attempts):
+    predict, _ = echo(fail_first=100)
+    service, port = prediction_server(predict)
+
+    with PipelinedPredictionClient("localhost", port, retry_policy=policy) as client:
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_array(np.asarray([[1]], dtype='f'))
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_arrays([ np.asarray([[1]], dtype='f') ])
+
+    assert service.calls == 2 * attempts
+
+def test_construction_does_not_fail_without_service():
+    client = PipelinedPredictionClient("localhost", 1, connect_timeout=0.1)
+    client.close()
+
+def test_raises_if_max_in_flight_is_invalid():
+    with pytest.raises(ValueError):
+        PipelinedPredictionClient("localhost", 1, max_in_flight=0, connect_timeout=None)
+
+def test_keepalive_defaults_are_accepted_by_default_servers():
+    client = PipelinedPredictionClient("localhost", 1, connect_timeout=None)
+    with mock.patch('grpc.insecure_channel') as insecure_channel:
+        client._channel_func()
+    options = dict(insecure_channel.call_args[1]['options'])
+
+    # gRPC servers answer more frequent pings, or pings without calls, with GOAWAY too_many_pings
+    assert options['grpc.keepalive_time_ms'] >= 300000
+    assert options['grpc.keepalive_permit_without_calls'] == 0
+
+    with pytest.raises(ValueError):
+        PipelinedPredictionClient("localhost", 1, connect_timeout=None, keepalive_time_ms=0)
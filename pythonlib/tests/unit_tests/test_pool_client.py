@@ -0,0 +1,160 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from unittest import mock
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.external.tensorflow_serving.apis import get_model_metadata_pb2
+from amlrealtimeai.external.tensorflow_serving.apis import predict_pb2
+from amlrealtimeai.pool import PooledPredictionClient, LEAST_OUTSTANDING
+from amlrealtimeai.tensor_codec import fill_tensor_proto
+
+def respond_with(value):
+    def predict(request, context):
+        response = predict_pb2.PredictResponse()
+        fill_tensor_proto(response.outputs["output_alias"], np.asarray([[ value ]], dtype='f'))
+        return response
+    return predict
+
+def fail(request, context):
+    context.abort(grpc.StatusCode.UNAVAILABLE, "down")
+
+def metadata(request, context):
+    signatures = get_model_metadata_pb2.SignatureDefMap()
+    signatures.signature_def['serving_default'].method_name = 'tensorflow/serving/predict'
+    response = get_model_metadata_pb2.GetModelMetadataResponse()
+    response.metadata['signature_def'].Pack(signatures)
+    return response
+
+def test_create_pooled_client_raises_if_endpoints_are_empty():
+    with pytest.raises(ValueError):
+        PooledPredictionClient([])
+
+def test_create_pooled_client_raises_on_malformed_endpoint():
+    with pytest.raises(ValueError):
+        PooledPredictionClient(["localhost"])
+
+def test_create_pooled_client_raises_on_unknown_strategy():
+    with pytest.raises(ValueError):
+        PooledPredictionClient(["localhost:50051"], strategy="random")
+
+def test_round_robin_spreads_requests(prediction_server):
+    service_a, port_a = prediction_server(respond_with(1))
+    service_b, port_b = prediction_server(respond_with(2))
+
+    with PooledPredictionClient(["localhost:{0}".format(port_a), ("localhost", port_b)]) as client:
+        results = [ client.score_numpy_array(np.asarray([[1]], dtype='f'))[0][0] for _ in range(4) ]
+
+    assert sorted(results) == [ 1, 1, 2, 2 ]
+    assert service_a.calls == 2
+    assert service_b.calls == 2
+
+def test_least_outstanding_uses_idle_endpoint(prediction_server):
+    started = threading.Event()
+    release = threading.Event()
+
+    def block(request, context):
+        started.set()
+        release.wait(5)
+        return respond_with(1)(request, context)
+
+    busy_service, busy_port = prediction_server(block)
+    idle_service, idle_port = prediction_server(respond_with(2))
+
+    with PooledPredictionClient(["localhost:{0}".format(busy_port), "localhost:{0}".format(idle_port)],
+                                strategy=LEAST_OUTSTANDING) as client:
+        # round robin starts with the first endpoint, which then stays busy
+        slow = threading.Thread(target=lambda: client.score_numpy_array(np.asarray([[1]], dtype='f')))
+        slow.start()
+        assert started.wait(5)
+
+        results = [ client.score_numpy_array(np.asarray([[1]], dtype='f'))[0][0] for _ in range(3) ]
+        assert [ s['outstanding'] for s in client.endpoint_stats ] == [ 1, 0 ]
+        release.set()
+        slow.join()
+
+    assert results == [ 2, 2, 2 ]
+    assert busy_service.calls == 1
+    assert idle_service.calls == 3
+
+def test_failed_endpoint_is_ejected(prediction_server):
+    bad_service, bad_port = prediction_server(fail)
+    good_service, good_port = prediction_server(respond_with(2))
+
+    now = datetime.now()
+    client = PooledPredictionClient(["localhost:{0}".format(bad_port), "localhost:{0}".format(good_port)],
+                                    ejection_duration=timedelta(seconds=30))
+    client._get_datetime_now = lambda: now
+
+    results = [ client.score_numpy_array(np.asarray([[1]], dtype='f'))[0][0] for _ in range(4) ]
+    assert results == [ 2, 2, 2, 2 ]
+    assert bad_service.calls == 1
+    assert good_service.calls == 4
+
+    stats = client.endpoint_stats
+    assert stats[0]['healthy'] is False
+    assert stats[0]['failures'] == 1
+    assert stats[1]['healthy'] is True
+
+    # the endpoint is tried again once the cool-down period is over
+    now = now + timedelta(seconds=31)
+    client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    assert bad_service.calls == 2
+    client.close()
+
+def test_raises_when_every_endpoint_fails(prediction_server):
+    _, port_a = prediction_server(fail)
+    _, port_b = prediction_server(fail)
+
+    with PooledPredictionClient(["localhost:{0}".format(port_a), "localhost:{0}".format(port_b)]) as client:
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_array(np.asarray([[1]], dtype='f'))
+        assert sum(s['failures'] for s in client.endpoint_stats) == 3
+
+def test_invalid_argument_does_not_eject_endpoint(prediction_server):
+    def reject(request, context):
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT, "bad input")
+
+    service, port = prediction_server(reject)
+
+    with PooledPredictionClient(["localhost:{0}".format(port)]) as client:
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_array(np.asarray([[1]], dtype='f'))
+        assert service.calls == 1
+        assert client.endpoint_stats[0]['healthy'] is True
+
+def test_get_model_signature_fails_over(prediction_server):
+    bad_service, bad_port = prediction_server(fail, fail)
+    good_service, good_port = prediction_server(respond_with(2), metadata)
+
+    client = PooledPredictionClient(["localhost:{0}".format(bad_port), "localhost:{0}".format(good_port)])
+    assert client.get_model_signature().name == 'serving_default'
+    assert good_service.metadata_calls == 1
+    assert client.endpoint_stats[0]['failures'] == bad_service.metadata_calls
+
+    with mock.patch.object(PredictionClient, 'close', autospec=True) as base_close:
+        client.close()
+    # the base client's channel and cached signatures are released as well
+    base_close.assert_called_once_with(client)
+
+def test_connect_warms_every_endpoint_and_ejects_the_unreachable(prediction_server):
+    service, port = prediction_server(respond_with(1))
+
+    with PooledPredictionClient(["localhost:{0}".format(port), "localhost:1"], channels_per_endpoint=2) as client:
+        client.connect(timeout=1.0)
+
+        assert [ s['healthy'] for s in client.endpoint_stats ] == [ True, False ]
+        # the channel of the base client is not used by the pool, it is not opened
+        assert client._channel_generation == 0
+        assert client.score_numpy_array(np.asarray([[1]], dtype='f'))[0][0] == 1
+        assert service.calls == 1
+
+def test_connect_raises_when_no_endpoint_is_reachable():
+    with PooledPredictionClient(["localhost:1", "localhost:2"]) as client:
+        with pytest.raises(grpc.FutureTimeoutError):
+            client.connect(timeout=0.2)
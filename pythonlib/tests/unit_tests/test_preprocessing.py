@@ -0,0 +1,119 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import io
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+Image = pytest.importorskip("PIL.Image")
+
+from amlrealtimeai.protos import types_pb2
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.preprocessing import ImagePreprocessor
+from amlrealtimeai.tensor_codec import make_tensor_proto, make_ndarray
+
+def make_jpeg(width, height, color=(255, 0, 0)):
+    image = Image.new('RGB', (width, height), color)
+    encoded = io.BytesIO()
+    image.save(encoded, format='JPEG', quality=95)
+    return encoded.getvalue()
+
+def make_files(count):
+    directory = tempfile.mkdtemp()
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, "img{0:02d}.jpg".format(i))
+        with open(path, "wb") as f:
+            f.write(make_jpeg(640 + i, 480, (i * 10, 0, 0)))
+        paths.append(path)
+    return paths
+
+def make_client(preprocessor):
+    requests = []
+
+    def predict_mock(request, timeout):
+        requests.append(request)
+        tensor = request.inputs['images']
+        result = mock.MagicMock()
+        if tensor.dtype == types_pb2.DT_STRING:
+            decoded = np.asarray(Image.open(io.BytesIO(tensor.string_val[0])))
+        else:
+            decoded = make_ndarray(tensor)[0]
+        # returns the size and the mean of the red channel of the image it got
+        output = np.asarray([[ decoded.shape[0], decoded.shape[1], decoded[..., 0].mean() ]], dtype='f')
+        result.outputs = { "output_alias": make_tensor_proto(output) }
+        return result
+
+    stub_mock = mock.Mock()
+    stub_mock.Predict = mock.MagicMock(side_effect=predict_mock)
+    client = PredictionClient("localhost", 50051, preprocessor=preprocessor)
+    client._get_grpc_stub = lambda: stub_mock
+    return client, requests
+
+def test_preprocessor_resizes_and_crops_to_jpeg():
+    data = make_jpeg(3000, 2000)
+    processed = ImagePreprocessor(224)(data)
+
+    assert isinstance(processed, bytes)
+    assert len(processed) < len(data)
+    assert Image.open(io.BytesIO(processed)).size == (224, 224)
+
+def test_preprocessor_converts_to_tensors():
+    data = make_jpeg(300, 400, (255, 255, 255))
+
+    uint8 = ImagePreprocessor(32, output='uint8')(data)
+    assert uint8.shape == (32, 32, 3)
+    assert uint8.dtype == np.uint8
+
+    normalized = ImagePreprocessor(32, crop=False, output='float32', mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5))(data)
+    assert normalized.shape == (32, 32, 3)
+    assert normalized.dtype == np.float32
+    assert np.allclose(normalized, 1.0, atol=0.02)
+
+def test_preprocessor_raises_on_invalid_settings():
+    with pytest.raises(ValueError):
+        ImagePreprocessor(0)
+    with pytest.raises(ValueError):
+        ImagePreprocessor(224, output='png')
+    with pytest.raises(ValueError):
+        ImagePreprocessor(224, resize=100)
+
+def test_score_image_sends_preprocessed_image():
+    client, requests = make_client(ImagePreprocessor(64, output='uint8'))
+    path = make_files(1)[0]
+
+    result = client.score_image(path)
+
+    assert list(result[:2]) == [ 64, 64 ]
+    tensor = requests[0].inputs['images']
+    assert tensor.dtype == types_pb2.DT_UINT8
+    assert [ dim.size for dim in tensor.tensor_shape.dim ] == [ 1, 64, 64, 3 ]
+
+def test_score_images_preprocesses_in_worker_processes_in_order():
+    client, requests = make_client(ImagePreprocessor(48))
+    paths = make_files(6)
+
+    with mock.patch('concurrent.futures.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as executor:
+        results = list(client.score_images(paths, processes=2, max_in_flight=3))
+
+    # forked workers could inherit the state of gRPC's threads
+    assert executor.call_args[1]['mp_context'].get_start_method() == 'spawn'
+    assert len(results) == 6
+    assert all(list(result[:2]) == [ 48, 48 ] for result in results)
+    red = [ result[2] for result in results ]
+    assert red == sorted(red)
+    assert all(request.inputs['images'].dtype == types_pb2.DT_STRING for request in requests)
+
+def test_score_images_without_preprocessor_sends_files():
+    client, requests = make_client(None)
+    paths = make_files(2)
+
+    results = list(client.score_images(paths))
+
+    assert [ list(result[:2]) for result in results ] == [ [ 480, 640 ], [ 480, 641 ] ]
+    with open(paths[0], 'rb') as f:
+        assert requests[0].inputs['images'].string_val[0] == f.read()
@@ -0,0 +1,167 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import grpc
+import threading
+import time
+import numpy as np
+from unittest import mock
+
+from amlrealtimeai.client import PredictionClient
+from amlrealtimeai.protos import predict_pb2
+from amlrealtimeai.retry import RetryPolicy, RetryBudget
+from amlrealtimeai.tensor_codec import fill_tensor_proto, make_ndarray, make_tensor_proto
+
+class FakeRpcError(grpc.RpcError):
+
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+def make_client(errors, retry_policy):
+    channel_mock_loaded = { 'value': 0 }
+    remaining = list(errors)
+
+    def unary_unary(id, request_serializer, response_deserializer):
+        def predict(req, timeout):
+            if remaining:
+                raise remaining.pop(0)
+            result = mock.MagicMock()
+            result.outputs = { "output_alias": make_tensor_proto(np.asarray([[ 1 ]], dtype='f')) }
+            return result
+        return predict
+
+    def load_channel_mock():
+        channel_mock_loaded['value'] += 1
+        channel_mock = mock.Mock()
+        channel_mock.unary_unary = mock.MagicMock(side_effect=unary_unary)
+        return channel_mock
+
+    client = PredictionClient("localhost", 50051, retry_policy=retry_policy)
+    client._channel_func = load_channel_mock
+    return client, channel_mock_loaded
+
+def test_create_policy_raises_if_max_attempts_is_invalid():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+
+def test_backoff_is_exponential_with_jitter():
+    policy = RetryPolicy(initial_backoff=1.0, backoff_multiplier=2.0, max_backoff=5.0, jitter=0.1)
+    for attempt, expected in [ (1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0) ]:
+        delay = policy.backoff(attempt)
+        assert expected * 0.9 <= delay <= expected * 1.1
+
+def test_only_retryable_codes_are_retried():
+    policy = RetryPolicy()
+    assert policy.is_retryable(FakeRpcError(grpc.StatusCode.UNAVAILABLE))
+    assert policy.is_retryable(grpc.RpcError())
+    assert not policy.is_retryable(FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT))
+    assert not policy.is_retryable(FakeRpcError(grpc.StatusCode.NOT_FOUND))
+
+def test_budget_limits_retries():
+    budget = RetryBudget(max_tokens=2, refill_per_second=0)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    policy = RetryPolicy(jitter=0, budget=RetryBudget(max_tokens=1, refill_per_second=0))
+    error = FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+    assert policy.next_backoff(error, 1) == 1.0
+    assert policy.next_backoff(error, 1) is None
+
+def test_deadline_stops_retries():
+    policy = RetryPolicy(initial_backoff=1.0, jitter=0, deadline=0.5)
+    deadline = policy.start()
+    assert policy.next_backoff(FakeRpcError(grpc.StatusCode.UNAVAILABLE), 1, deadline) is None
+    assert 0 < policy.attempt_timeout(10.0, deadline) <= 0.5
+
+def test_client_does_not_retry_invalid_argument():
+    client, channel_mock_loaded = make_client([ FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT) ], RetryPolicy())
+    with mock.patch('time.sleep') as sleep_mock:
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    sleep_mock.assert_not_called()
+    assert channel_mock_loaded['value'] == 1
+
+def test_client_keeps_channel_on_deadline_exceeded():
+    errors = [ FakeRpcError(grpc.StatusCode.DEADLINE_EXCEEDED) ] * 2
+    client, channel_mock_loaded = make_client(errors, RetryPolicy(initial_backoff=0.5, jitter=0))
+    with mock.patch('time.sleep') as sleep_mock:
+        result = client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    assert result[0][0] == 1
+    assert [ c[0][0] for c in sleep_mock.call_args_list ] == [ 0.5, 1.0 ]
+    assert channel_mock_loaded['value'] == 1
+
+def test_client_rebuilds_channel_on_unavailable():
+    client, channel_mock_loaded = make_client([ FakeRpcError(grpc.StatusCode.UNAVAILABLE) ], RetryPolicy(jitter=0))
+    with mock.patch('time.sleep'):
+        client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    assert channel_mock_loaded['value'] == 2
+
+def test_client_gives_up_after_max_attempts():
+    errors = [ FakeRpcError(grpc.StatusCode.UNAVAILABLE) ] * 3
+    client, _ = make_client(errors, RetryPolicy(max_attempts=3))
+    with mock.patch('time.sleep') as sleep_mock:
+        with pytest.raises(grpc.RpcError):
+            client.score_numpy_array(np.asarray([[1]], dtype='f'))
+    assert sleep_mock.call_count == 2
+
+def test_calls_in_flight_survive_a_channel_rebuild(prediction_server):
+    lock = threading.Lock()
+    failed = { 'value': False }
+
+    def predict(request, context):
+        with lock:
+            fail, failed['value'] = not failed['value'], True
+        if fail:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "unavailable")
+        # still in flight when the failed call rebuilds the channel
+        time.sleep(0.2)
+        response = predict_pb2.PredictResponse()
+        fill_tensor_proto(response.outputs['output_alias'], make_ndarray(request.inputs['images']))
+        return response
+
+    service, port = prediction_server(predict)
+    client = PredictionClient("localhost", port, retry_policy=RetryPolicy(initial_backoff=0.01, jitter=0))
+
+    results = client.score_numpy_arrays([ np.asarray([ i ], dtype='f') for i in range(4) ], max_in_flight=4)
+
+    assert [ result[0] for result in results ] == [ 0, 1, 2, 3 ]
+    # the old channel is closed only after a grace period, so only the failed call is sent again
+    assert service.calls == 5
+    client.close()
+
+def test_replaced_channel_is_closed_after_grace_period():
+    channels = []
+    errors = [ FakeRpcError(grpc.StatusCode.UNAVAILABLE) ]
+
+    def unary_unary(id, request_serializer, response_deserializer):
+        def predict(req, timeout):
+            if errors:
+                raise errors.pop(0)
+            result = mock.MagicMock()
+            result.outputs = { "output_alias": make_tensor_proto(np.asarray([[ 1 ]], dtype='f')) }
+            return result
+        return predict
+
+    def load_channel_mock():
+        channels.append(mock.Mock())
+        channels[-1].unary_unary = mock.MagicMock(side_effect=unary_unary)
+        return channels[-1]
+
+    client = PredictionClient("localhost", 50051, retry_policy=RetryPolicy(initial_backoff=0.01, jitter=0))
+    client._channel_func = load_channel_mock
+
+    # the grace period is the timeout of the call that failed
+    client.score_numpy_array(np.asarray([[ 1 ]], dtype='f'), timeout=0.1)
+    assert len(channels) == 2
+    assert not channels[0].close.called
+    time.sleep(0.3)
+    assert channels[0].close.call_count == 1
+    assert not channels[1].close.called
+
+    client.close()
+    assert channels[0].close.call_count == 1
+    assert channels[1].close.call_count == 1
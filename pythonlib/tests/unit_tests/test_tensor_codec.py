@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License
+import pytest
+import numpy as np
+
+from amlrealtimeai.protos import types_pb2
+
+from amlrealtimeai.tensor_codec import make_tensor_proto, make_ndarray, fill_tensor_proto, to_datatype
+
+@pytest.mark.parametrize("dtype", [ 'float32', 'float64', 'float16', 'int8', 'int16', 'int32', 'int64', 'uint8', 'uint16', 'bool', 'complex64' ])
+def test_round_trip(dtype):
+    data = (np.arange(24).reshape(2, 3, 4) % 7).astype(dtype)
+    tensor = make_tensor_proto(data)
+    assert tensor.dtype == to_datatype(dtype)
+    assert [ d.size for d in tensor.tensor_shape.dim ] == [ 2, 3, 4 ]
+    result = make_ndarray(tensor)
+    assert result.dtype == data.dtype
+    assert np.array_equal(result, data)
+
+def test_make_tensor_proto_casts_to_datatype():
+    tensor = make_tensor_proto(np.asarray([[1, 2, 3]]), types_pb2.DT_FLOAT)
+    assert tensor.dtype == types_pb2.DT_FLOAT
+    assert len(tensor.tensor_content) == 3 * 4
+    assert make_ndarray(tensor).dtype == np.float32
+
+def test_scalar_keeps_empty_shape():
+    tensor = make_tensor_proto(np.float32(3))
+    assert len(tensor.tensor_shape.dim) == 0
+    assert make_ndarray(tensor) == 3
+    assert make_ndarray(tensor).shape == ()
+
+def test_string_round_trip():
+    tensor = make_tensor_proto(np.asarray([b"abc", "def"], dtype=object), types_pb2.DT_STRING)
+    assert list(tensor.string_val) == [ b"abc", b"def" ]
+    result = make_ndarray(tensor)
+    assert result.shape == (2,)
+    assert list(result) == [ b"abc", b"def" ]
+
+def test_make_ndarray_reads_typed_value_fields():
+    tensor = make_tensor_proto(np.zeros((2, 2), dtype='f'))
+    tensor.ClearField('tensor_content')
+    tensor.float_val.extend([ 1, 2, 3, 4 ])
+    assert np.array_equal(make_ndarray(tensor), [[1, 2], [3, 4]])
+
+def test_make_ndarray_reads_half_val():
+    data = np.asarray([ 1.5, -2.0 ], dtype=np.float16)
+    tensor = make_tensor_proto(data)
+    tensor.ClearField('tensor_content')
+    tensor.half_val.extend(data.view(np.uint16).tolist())
+    assert np.array_equal(make_ndarray(tensor), data)
+
+def test_make_ndarray_broadcasts_single_value():
+    tensor = make_tensor_proto(np.zeros((2, 3), dtype='f'))
+    tensor.ClearField('tensor_content')
+    tensor.float_val.append(5)
+    assert np.array_equal(make_ndarray(tensor), np.full((2, 3), 5, dtype='f'))
+
+def test_make_ndarray_raises_on_wrong_value_count():
+    tensor = make_tensor_proto(np.zeros((2, 3), dtype='f'))
+    tensor.ClearField('tensor_content')
+    tensor.float_val.extend([ 1, 2 ])
+    with pytest.raises(ValueError):
+        make_ndarray(tensor)
+
+def test_fill_tensor_proto_replaces_previous_content():
+    tensor = make_tensor_proto(np.zeros((4, 4), dtype='f'))
+    fill_tensor_proto(tensor, np.asarray([1, 2], dtype='f'))
+    assert [ d.size for d in tensor.tensor_shape.dim ] == [ 2 ]
+    assert np.array_equal(make_ndarray(tensor), [ 1, 2 ])
+
+def test_unsupported_dtype_raises():
+    with pytest.raises(ValueError):
+        to_datatype('datetime64[s]')